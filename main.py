@@ -0,0 +1,20 @@
+import argparse
+from src import config as cfg
+from src import pipeline
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run the analysis scripts in dependency order'
+    )
+    parser.add_argument('stages', nargs='*',
+                        help='stages to run (default: all)')
+    parser.add_argument('--force', action='store_true',
+                        help='rerun stages even if their inputs are unchanged')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of parallel processes')
+    cfg.add_arguments(parser)
+    args = parser.parse_args()
+
+    pipeline.run(cfg.from_arguments(args), args.stages,
+                 force=args.force, workers=args.workers)
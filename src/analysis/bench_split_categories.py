@@ -0,0 +1,83 @@
+'''Micro-benchmark of utils.split_categories against the former iterrows loop
+on a synthetic frame of agenda combinations
+python -m src.analysis.bench_split_categories [--rows N] [--skip-loop]
+'''
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.analysis import utils
+
+
+AGENDAS = [
+    'Biomassa en voedsel',
+    'Bouwmaterialen',
+    'Consumptiegoederen',
+    'Kunststoffen',
+    'Maakindustrie',
+    'Biomassa en voedsel&Kunststoffen',
+    'Bouwmaterialen&Maakindustrie&Consumptiegoederen',
+]
+
+
+def split_categories_loop(df, column=None, amount='Gewicht_KG', extra=[]):
+    # former implementation (row by row)
+    split_rows = []
+    for idx, row in df.iterrows():
+        categories = [c.strip() for c in row[column].split('&')]
+        if len(categories) > 1:
+            value_per_cat = row[amount] / len(categories)
+            for cat in categories:
+                split_rows.append({
+                    column: cat,
+                    amount: value_per_cat,
+                    **{col: row[col] for col in extra}
+                })
+        else:
+            split_rows.append(row[[column, amount, *extra]].to_dict())
+    cleaned_data = pd.DataFrame(data=split_rows)
+
+    groups = cleaned_data.groupby([
+        column,
+        *extra
+    ]).agg(**{
+        amount: (amount, 'sum')
+    }).reset_index()
+
+    cats = sorted(groups[column].drop_duplicates().to_list())
+
+    return cats, groups
+
+
+def synthetic_flows(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'agendas': rng.choice(AGENDAS, rows),
+        'Gewicht_KG': rng.integers(1, 10**6, rows),
+    })
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time split_categories')
+    parser.add_argument('--rows', type=int, default=10**6,
+                        help='rows of the synthetic frame (default: 1M)')
+    parser.add_argument('--skip-loop', action='store_true',
+                        help='only time the vectorized implementation')
+    args = parser.parse_args()
+
+    df = synthetic_flows(args.rows)
+    (cats, groups), seconds = timed(utils.split_categories, df, column='agendas')
+    print(f'vectorized: {seconds:.2f} s for {args.rows} rows')
+
+    if not args.skip_loop:
+        (loop_cats, loop_groups), loop_seconds = timed(split_categories_loop, df, column='agendas')
+        print(f'iterrows:   {loop_seconds:.2f} s for {args.rows} rows')
+        assert cats == loop_cats
+        assert np.allclose(groups['Gewicht_KG'], loop_groups['Gewicht_KG'], rtol=1e-12)
+        print('results match')
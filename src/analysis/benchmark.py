@@ -1,35 +1,7 @@
+from functools import lru_cache
 import pandas as pd
 import variables as var
-from src.analysis import utils
-
-
-# VARIABLES
-VARS = {
-    'INPUT_DIR': var.INPUT_DIR,
-    'AREA_DIR': var.AREA_DIR,
-    'AREA': var.AREA,
-    'LEVEL': var.LEVEL,
-    'YEAR': var.YEAR,
-    'OUTPUT_DIR': var.OUTPUT_DIR
-}
-UNIT = var.UNITS['WASTE']['BENCHMARK']
-
-
-def filter_by_area(df):
-    ROLES = var.ROLES
-
-    # import areas
-    # import province polygon
-    polygon = utils.import_areas(level=VARS['LEVEL'])
-    polygon = polygon[polygon['name'] == VARS['AREA']]
-    assert len(polygon) == 1
-
-    # add areas to roles
-    source = ROLES['Ontvangst']['source']  # source role
-    df = utils.add_areas(df, role=source, areas=polygon, admin_level=VARS['LEVEL'])
-
-    # ONLY PRODUCTION
-    return df[df[f"{source}_{VARS['LEVEL']}"] == VARS['AREA']]
+from src.analysis import utils, stage_cache
 
 
 def get_potential(df, rladder=None):
@@ -44,12 +16,7 @@ def get_potential(df, rladder=None):
     return df
 
 
-def import_dataset(path, area_filter=False):
-    df = pd.read_csv(path, low_memory=False)
-    df['EuralCode'] = df['EuralCode'].astype(str).str.zfill(6)
-    if area_filter:
-        df = filter_by_area(df)
-
+def import_dataset(df):
     # aggregate per eural code & process
     groupby = [
         'EuralCode',
@@ -59,59 +26,163 @@ def import_dataset(path, area_filter=False):
         'amount_kg': ('Gewicht_KG', 'sum')
     }
     cols = groupby + [col for col, func in agg.values()]
-    eural_processes = df[cols].groupby(by=groupby, as_index=False).agg(**agg)
+    eural_processes = df[cols].groupby(by=groupby, as_index=False, observed=True).agg(**agg)
     eural_processes = eural_processes.rename(columns={
         'EuralCode': 'eural_code',
         'VerwerkingsmethodeCode': 'processing_code'
     })
+    for col in ['eural_code', 'processing_code']:
+        eural_processes[col] = eural_processes[col].astype(str)
 
     return eural_processes
 
 
-def exclude_rladder_restrictions(df):
+def import_exclusions(config):
+    """
+    exclusion rules as indices for anti-joins
+    (loaded once per version of the description files)
+    restrictions: (current process, alternative process) pairs
+    eural_processes: (eural code, alternative process) pairs
+    """
+    path = f"{config.data_dir}/descriptions"
+    files = [
+        f"{path}/rladder_restrictions.xlsx",
+        f"{path}/alternatives_exclude_processes.xlsx"
+    ]
+    return read_exclusions(*files, *[utils.file_stamp(file) for file in files])
+
+
+@lru_cache(maxsize=None)
+def read_exclusions(restrictions_file, eural_processes_file, *stamps):
+    print("Import exclusions...")
+    ref = pd.read_excel(restrictions_file, sheet_name='Restrictions')
+    restrictions = pd.MultiIndex.from_frame(ref[['code', 'exception']])
+
+    ref = pd.read_excel(eural_processes_file)
+    ref = ref[['EuralCode', 'VerwerkingsmethodeCode']]
+    ref['EuralCode'] = ref['EuralCode'].astype(str).str.zfill(6)
+    eural_processes = pd.MultiIndex.from_frame(ref)
+
+    return restrictions, eural_processes
+
+
+def exclude(df, ref, on):
+    """
+    anti-join: drop rows with (on) values in ref index
+    """
+    return df[~pd.MultiIndex.from_frame(df[on]).isin(ref)]
+
+
+def exclude_rladder_restrictions(config, df):
     # exclude based on r-ladder restrictions
     # from process to process
     print("Exclude based on r-ladder restrictions...")
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions"
-    ref = pd.read_excel(f"{path}/rladder_restrictions.xlsx", sheet_name='Restrictions')
-
-    # apply exceptions
-    ref = ref[[
-        'code',
-        'exception'
-    ]].to_records(index=False).tolist()
-    df = df[~df[[
+    restrictions, _ = import_exclusions(config)
+    return exclude(df, restrictions, on=[
         'processing_code_curr',
         'processing_code_alt'
-    ]].apply(tuple, axis=1).isin(ref)]
-
-    return df
+    ])
 
 
-def exclude_eural_process(df):
+def exclude_eural_process(config, df):
     # exclude ewc-process pairs
+    # (on alternatives before pairing them with current processes)
     print("Exclude eural code & alternative process pairs...")
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions"
-    ref = pd.read_excel(f"{path}/alternatives_exclude_processes.xlsx")
-    ref = ref[['EuralCode', 'VerwerkingsmethodeCode']]
-    ref['EuralCode'] = ref['EuralCode'].astype(str).str.zfill(6)
+    _, eural_processes = import_exclusions(config)
+    return exclude(df, eural_processes, on=[
+        'eural_code',
+        'processing_code'
+    ])
 
-    # apply exceptions
-    ref = ref[[
-        'EuralCode',
-        'VerwerkingsmethodeCode'
-    ]].to_records(index=False).tolist()
-    df = df[~df[[
+
+def current_processes(province_data):
+    """
+    area processes with alternatives to look for (all but rank I)
+    """
+    return province_data[province_data['benchmark_group'] != 'I']
+
+
+def admissible_alternatives(config, province_data, national_data):
+    """
+    all national alternatives per area process of a higher rank
+    (pairs of current & alternative process for the exported table)
+    """
+    potential = pd.merge(current_processes(province_data),
+                         exclude_eural_process(config, national_data),
+                         how='left',
+                         on=['eural_code'],
+                         suffixes=['_curr', '_alt'])
+    potential = exclude_rladder_restrictions(config, potential)
+    return potential[
+        potential['benchmark_group_curr'] > potential['benchmark_group_alt']
+    ]
+
+
+def best_alternatives(config, province_data, national_data):
+    """
+    Highest ranked admissible national alternative
+    per area eural code & process, found by walking the alternatives
+    of each eural code in rank order (instead of pairing all
+    current & alternative processes); each step looks up the next
+    alternative of the processes still without one
+    """
+    restrictions, _ = import_exclusions(config)
+
+    # national alternatives per eural code by rank
+    alternatives = exclude_eural_process(config, national_data)[[
         'eural_code',
-        'processing_code_alt'
-    ]].apply(tuple, axis=1).isin(ref)]
+        'processing_code',
+        'benchmark_group'
+    ]].sort_values(by=['eural_code', 'benchmark_group'], kind='stable')
+    steps = alternatives.groupby('eural_code').cumcount()
 
-    return df
+    pending = current_processes(province_data)[[
+        'eural_code',
+        'processing_code',
+        'benchmark_group'
+    ]]
+    found = []
+    for step, candidates in alternatives.groupby(steps):
+        if pending.empty:
+            break
+        pairs = pd.merge(pending, candidates, how='inner',
+                         on=['eural_code'],
+                         suffixes=['_curr', '_alt'])
+
+        # ranks are sorted: a candidate of a lower rank ends the search
+        higher = pairs['benchmark_group_curr'] > pairs['benchmark_group_alt']
+        restricted = pd.MultiIndex.from_frame(pairs[[
+            'processing_code_curr',
+            'processing_code_alt'
+        ]]).isin(restrictions)
+        found.append(pairs[higher & ~restricted])
+
+        # restricted candidates: continue with the next one
+        pending = pairs.loc[higher & restricted, [
+            'eural_code',
+            'processing_code_curr',
+            'benchmark_group_curr'
+        ]].rename(columns={
+            'processing_code_curr': 'processing_code',
+            'benchmark_group_curr': 'benchmark_group'
+        })
+
+    columns = [
+        'eural_code',
+        'processing_code_curr',
+        'benchmark_group_curr',
+        'benchmark_group_alt'
+    ]
+    return pd.concat([df[columns] for df in found]) if found \
+        else pd.DataFrame(columns=columns)
 
 
-def export_potential(potential):
+def export_potential(config, province_data, national_data, output_dir=None):
+    # alternatives
+    potential = admissible_alternatives(config, province_data, national_data)
+
     # rladder
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions/rhierarchy.xlsx"
+    path = f"{config.data_dir}/descriptions/rhierarchy.xlsx"
     rladder = pd.read_excel(path)
     potential = pd.merge(potential, rladder, how='left',
                          left_on='processing_code_curr', right_on='processing_code')
@@ -119,7 +190,7 @@ def export_potential(potential):
                          left_on='processing_code_alt', right_on='processing_code')
 
     # eural
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions/ewc.xlsx"
+    path = f"{config.data_dir}/descriptions/ewc.xlsx"
     eural = pd.read_excel(path)
     eural['code'] = eural['code'].astype(str).str.zfill(6)
     potential = pd.merge(potential, eural, how='left',
@@ -137,10 +208,10 @@ def export_potential(potential):
         'benchmark_group_y': 'alternatieve verwerkingsgroep'
     }
     potential = potential[list(columns.keys())].rename(columns=columns)
-    potential.to_excel('../json/benchmark.xlsx', index=False)
+    utils.write_sheets(config, 'benchmark', {'data': potential}, output_dir=output_dir)
 
 
-def get_eurals(df):
+def get_eurals(config, df):
     # eurals
     groupby = [
         'eural_code',
@@ -154,7 +225,7 @@ def get_eurals(df):
     eurals = df[cols].groupby(by=groupby, as_index=False, dropna=False).agg(**agg)
 
     # eural
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions/ewc.xlsx"
+    path = f"{config.data_dir}/descriptions/ewc.xlsx"
     eural = pd.read_excel(path)
     eural['code'] = eural['code'].astype(str).str.zfill(6)
     eurals = pd.merge(eurals, eural, how='left',
@@ -167,61 +238,46 @@ def get_eurals(df):
         .to_dict(orient="records")[:5]
 
 
-def run():
-    print("\nWorking on potential sankey...")
-
-    # import rladder
-    print("Import rladder...")
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions/rhierarchy.xlsx"
-    rladder = pd.read_excel(path)
-    rladder = rladder[['processing_code', 'benchmark_group']]
-    rladder_names = {
-        r['benchmark_group'][0]: r['benchmark_group'][1:].strip()
-        for idx, r in rladder.iterrows()
-    }
-    rladder['benchmark_group'] = rladder['benchmark_group'].str[0]
-
-    # import province dataset
-    print(f"\nImport province dataset for {VARS['YEAR']}...")
-    path = f"{VARS['INPUT_DIR']}/{VARS['AREA_DIR']}/LMA/processed"
-    filename = f"{path}/ontvangst_{VARS['AREA'].lower()}_{VARS['YEAR']}_full.csv"
-    province_data = get_potential(
-        import_dataset(filename, area_filter=True),
-        rladder=rladder
-    )
-
-    # import national dataset
-    print(f"\nImport national dataset for {VARS['YEAR']}...")
-    path = f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/LMA/ontvangst/processed"
-    filename = f"{path}/ontvangst_{VARS['YEAR']}_full.csv"
-    national_data = get_potential(import_dataset(filename), rladder=rladder)
-
-    # compute potential
-    potential = pd.merge(province_data, national_data,
-                         how='left',
-                         on=['eural_code'],
-                         suffixes=['_curr', '_alt'])
-
-    # apply exceptions
-    potential = potential[potential['benchmark_group_curr'] != 'I']
-    potential = exclude_rladder_restrictions(potential)
-    potential = exclude_eural_process(potential)
-    potential = potential[
-        potential['benchmark_group_curr'] > potential['benchmark_group_alt']
+def get_national_data(config, rladder):
+    """
+    National processing per eural code & process with benchmark groups,
+    materialized once per year in the cache folder
+    (refreshed when the LMA file or the r-ladder changes)
+    """
+    path = f"{config.data_dir}/LMA/ontvangst/processed/ontvangst_{config.year}_full.csv"
+    cached = utils.cache_path(config, path, folder='benchmark')
+    stamp = ';'.join(utils.file_stamp(source) for source in [
+        path,
+        f"{config.data_dir}/descriptions/rhierarchy.xlsx"
+    ])
+    national_data = utils.read_cached(cached, stamp)
+    if national_data is None:
+        national_data = get_potential(import_dataset(utils.aggregate_lma(path)), rladder=rladder)
+        utils.write_cached(national_data, cached, stamp)
+
+    return national_data
+
+
+def benchmark_files(config):
+    """
+    descriptions read by get_benchmark
+    """
+    path = f"{config.data_dir}/descriptions"
+    return [
+        f"{path}/rladder_restrictions.xlsx",
+        f"{path}/alternatives_exclude_processes.xlsx",
+        f"{path}/ewc.xlsx",
     ]
-    export_potential(potential)
 
-    # get max rank for each eural code
-    groupby = [
-        'eural_code',
-        'processing_code_curr',
-        'benchmark_group_curr',
-    ]
-    agg = {
-        'benchmark_group_alt': ('benchmark_group_alt', 'min'),
-    }
-    cols = groupby + [col for col, func in agg.values()]
-    min_alt = potential[cols].groupby(by=groupby, as_index=False).agg(**agg)
+
+@stage_cache.memoize(files=benchmark_files, settings=['level'])
+def get_benchmark(config, province_data, national_data, rladder_names={}):
+    """
+    Compare area processing with national alternatives
+    returns sankey data
+    """
+    # best alternative for each eural code & process
+    min_alt = best_alternatives(config, province_data, national_data)
 
     # match potential with province data
     province_data = pd.merge(province_data, min_alt, how='left',
@@ -253,8 +309,9 @@ def run():
     targets = targets.rename(columns={'benchmark_group_alt': 'benchmark_group'})
 
     # export data
+    unit = config.units['WASTE']['BENCHMARK']
     data = {
-        'table': get_eurals(province_data),
+        'table': get_eurals(config, province_data),
         'nodes': [],
         'links': []
     }
@@ -264,9 +321,9 @@ def run():
             'rank': n['benchmark_group'],
             'name': rladder_names[n['benchmark_group']],
             'value': utils.kg_to_unit(
-                n['amount_kg'], unit=UNIT
+                n['amount_kg'], unit=unit
             ),
-            'unit': UNIT,
+            'unit': unit,
             'pct': n['pct']
         } for idx, n in df.iterrows()])
     data['links'].extend([{
@@ -275,9 +332,71 @@ def run():
         'source_rank': l['benchmark_group'],
         'target_rank': l['benchmark_group_alt'],
         'value': utils.kg_to_unit(
-            l['amount_kg'], unit=UNIT
+            l['amount_kg'], unit=unit
         ),
-        'unit': UNIT
+        'unit': unit
     } for idx, l in links.iterrows()])
 
-    return data
\ No newline at end of file
+    return data
+
+
+def run(config):
+    print("\nWorking on potential sankey...")
+
+    # import rladder
+    rladder, rladder_names = utils.import_rladder(config)
+
+    # import province dataset
+    print(f"\nImport province dataset for {config.year}...")
+    province_data = get_potential(
+        import_dataset(utils.get_production(
+            config,
+            area=config.area,
+            level=config.level,
+            year=config.year,
+            role=var.ROLES['Ontvangst']['source']
+        )),
+        rladder=rladder
+    )
+
+    # import national dataset
+    print(f"\nImport national dataset for {config.year}...")
+    national_data = get_national_data(config, rladder)
+
+    data = get_benchmark(config, province_data, national_data, rladder_names=rladder_names)
+    export_potential(config, province_data, national_data)
+
+    return data
+
+
+def run_areas(config, areas=None):
+    """
+    Benchmark sankeys for all areas of the config level at once,
+    alternatives exported to the folder of each area
+    returns {area: sankey}
+    """
+    print("\nWorking on potential sankeys...")
+    rladder, rladder_names = utils.import_rladder(config)
+
+    print(f"\nImport national dataset for {config.year}...")
+    role = var.ROLES['Ontvangst']['source']
+    national_data = get_national_data(config, rladder)
+    productions = utils.get_area_productions(
+        config,
+        level=config.level,
+        year=config.year,
+        role=role,
+        areas=areas
+    )
+
+    results = {}
+    for area, df in productions.items():
+        print(f"\nCompute benchmark for {area}...")
+        province_data = get_potential(import_dataset(df), rladder=rladder)
+        results[area] = get_benchmark(
+            config, province_data, national_data, rladder_names=rladder_names
+        )
+        export_potential(config, province_data, national_data,
+                         output_dir=utils.area_dir(config, area=area, level=config.level))
+
+    return results
@@ -1,14 +1,10 @@
 import pandas as pd
 import variables as var
 import numpy as np
+from src.analysis import utils
 
 
-FILEPATH = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/monitor_data/data"
-DATA = {}
-
-
-def calculate_impacts(data_file='', impact_file='', group_relation_file=''):
-    data = pd.read_excel(data_file, sheet_name='NON_FE')
+def calculate_impacts(data, impact_file='', group_relation_file=''):
     impacts = pd.read_excel(impact_file).drop(columns='Unnamed: 0')
     ta = pd.read_excel(group_relation_file, sheet_name='goederen')
 
@@ -23,7 +19,7 @@ def calculate_impacts(data_file='', impact_file='', group_relation_file=''):
     return data
 
 
-def get_indicator_per_group(df, on='usage', value_col='CO2 emissions total (kt)', perc=False):
+def get_indicator_per_group(df, on='usage', value_col='CO2 emissions total (kt)', perc=False, year=None):
     groupby = {
         'usage': 'Gebruiksgroep_naam',
         'product': 'productgroepen'
@@ -31,7 +27,7 @@ def get_indicator_per_group(df, on='usage', value_col='CO2 emissions total (kt)'
 
     # Filter year
     if perc:
-        df = df[df['Jaar'] == var.YEAR]
+        df = df[df['Jaar'] == year]
         df = df[df['Gebruiksgroep_naam'] != 'Verandering voorraden']
 
     if on == 'product':
@@ -66,17 +62,17 @@ def get_indicator_per_group(df, on='usage', value_col='CO2 emissions total (kt)'
     return group_data
 
 
-def run():
-    emissions_file = f'{FILEPATH}/geoFluxus/MKI_CO2_factors.xlsx'
-    groups_file = fr'{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_productgroepen.xlsx'
+def run(config):
+    emissions_file = f'{config.monitor_dir}/geoFluxus/MKI_CO2_factors.xlsx'
+    groups_file = f'{config.data_dir}/ontology/npce_productgroepen.xlsx'
 
     # environmental impact of current area
-    all_data_file = f'{var.OUTPUT_DIR}/all_data.xlsx'
-    dat = calculate_impacts(all_data_file, emissions_file, groups_file)
-    dat.to_excel(f'{var.OUTPUT_DIR}/all_impact_data.xlsx')
+    data = utils.read_sheet(config, 'all_data', 'NON_FE')
+    dat = calculate_impacts(data, emissions_file, groups_file)
+    utils.write_sheets(config, 'all_impact_data', {'data': dat.reset_index()})
 
     # highlights
-    curr_year_data = dat[dat['Jaar'] == var.YEAR].copy()
+    curr_year_data = dat[dat['Jaar'] == config.year].copy()
     results = {
         'highlights': {
             'co2_emissions': {
@@ -119,7 +115,7 @@ def run():
             group_values = {}
 
             for name, indicator in indicators.items():
-                data = get_indicator_per_group(dat, on=group, value_col=indicator, perc=True)
+                data = get_indicator_per_group(dat, on=group, value_col=indicator, perc=True, year=config.year)
 
                 values = []
                 for group_name in group_names:
@@ -131,7 +127,7 @@ def run():
 
             section_results.append({
                 "level": "COROP",
-                "name": var.COROPS[0],
+                "name": config.corops[0],
                 "unit": '%',
                 "on": group,
                 "groups": group_names,
@@ -158,7 +154,7 @@ def run():
             values = []
             for group_name in group_names:
                 year_values = []
-                for year in var.DMI_YEARS:
+                for year in config.dmi_years:
                     row = data[
                         (data[group] == group_name) & \
                         (data['Jaar'] == year)
@@ -171,11 +167,11 @@ def run():
 
             section_results.append({
                 "level": "COROP",
-                "name": var.COROPS[0],
+                "name": config.corops[0],
                 "unit": unit,
                 "on": group,
                 "groups": group_names,
-                "years": var.DMI_YEARS,
+                "years": config.dmi_years,
                 "values": group_values
             })
 
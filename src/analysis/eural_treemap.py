@@ -3,36 +3,7 @@ import variables as var
 from src.analysis import utils
 
 
-# VARIABLES
-VARS = {
-    'INPUT_DIR': var.INPUT_DIR,
-    'AREA_DIR': var.AREA_DIR,
-    'AREA': var.AREA,
-    'LEVEL': var.LEVEL,
-    'YEAR': var.YEAR,
-    'OUTPUT_DIR': var.OUTPUT_DIR
-}
-UNIT = var.UNITS['WASTE']['EURAL_TREE']
-
-
-def filter_by_area(df):
-    ROLES = var.ROLES
-
-    # import areas
-    # import province polygon
-    polygon = utils.import_areas(level=VARS['LEVEL'])
-    polygon = polygon[polygon['name'] == VARS['AREA']]
-    assert len(polygon) == 1
-
-    # add areas to roles
-    source = ROLES['Ontvangst']['source']  # source role
-    df = utils.add_areas(df, role=source, areas=polygon, admin_level=VARS['LEVEL'])
-
-    # ONLY PRODUCTION
-    return df[df[f"{source}_{VARS['LEVEL']}"] == VARS['AREA']]
-
-
-def to_treemap(df):
+def to_treemap(df, unit='t'):
     hierarchy = {}
     extra = {}
     levels = [
@@ -54,9 +25,9 @@ def to_treemap(df):
                     **extra[e[f'{level}_code']],
                     'hazardous': e['hazardous'],
                     'value': utils.kg_to_unit(
-                        e['amount_kg'], unit=UNIT
+                        e['amount_kg'], unit=unit
                     ),
-                    'unit': UNIT
+                    'unit': unit
                 }
 
     tree = utils.update_tree({},
@@ -65,12 +36,12 @@ def to_treemap(df):
     return tree
 
 
-def run():
-    print("\nWorking on eural treemap...")
-
-    # import eural descriptions
+def import_descriptions(config):
+    """
+    eural chapter & code descriptions
+    """
     print("Load eural descriptions...")
-    path = f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/geofluxusApp/templates"
+    path = f"{config.data_dir}/geofluxusApp/templates"
     ewc2 = pd.read_excel(f"{path}/waste02.xlsx")
     ewc2['ewc_code'] = ewc2['ewc_code'].astype(str).str.zfill(2)
     ewc2 = ewc2[['ewc_code', 'ewc_name']].rename(
@@ -84,15 +55,14 @@ def run():
         columns={'ewc_code': 'eural_code', 'ewc_name': 'eural_name'}
     )
 
-    # import province dataset
-    print(f"\nImport province data for {VARS['YEAR']}...")
-    path = f"{VARS['INPUT_DIR']}/{VARS['AREA_DIR']}/LMA/processed"
-    filename = f"{path}/ontvangst_{VARS['AREA'].lower()}_{VARS['YEAR']}_full.csv"
-    df = pd.read_csv(filename, low_memory=False)
-    df['EuralCode'] = df['EuralCode'].astype(str).str.zfill(6)
-    print(f"\nFilter on production only within area...")
-    df = filter_by_area(df)
+    return ewc2, ewc6
+
 
+def get_treemap(df, ewc2=None, ewc6=None, unit='t'):
+    """
+    treemap of the top 20 eural codes
+    of an area production
+    """
     # aggregate per eural code
     groupby = [
         'EuralCode'
@@ -101,7 +71,8 @@ def run():
         'amount_kg': ('Gewicht_KG', 'sum')
     }
     cols = groupby + [col for col, func in agg.values()]
-    eurals = df[cols].groupby(by=groupby, as_index=False).agg(**agg)
+    eurals = df[cols].groupby(by=groupby, as_index=False, observed=True).agg(**agg)
+    eurals['EuralCode'] = eurals['EuralCode'].astype(str)
 
     # get top 20 streams by amount
     eurals = eurals.sort_values(by=['amount_kg'], ascending=False)[:20]
@@ -113,4 +84,48 @@ def run():
     eurals = pd.merge(eurals, ewc6, how='left', on='eural_code')
 
     # add to data
-    return to_treemap(eurals)
\ No newline at end of file
+    return to_treemap(eurals, unit=unit)
+
+
+def run(config):
+    print("\nWorking on eural treemap...")
+
+    # import eural descriptions
+    ewc2, ewc6 = import_descriptions(config)
+
+    # import province dataset
+    print(f"\nImport province production for {config.year}...")
+    df = utils.get_production(
+        config,
+        area=config.area,
+        level=config.level,
+        year=config.year,
+        role=var.ROLES['Ontvangst']['source']
+    )
+
+    return get_treemap(df, ewc2=ewc2, ewc6=ewc6,
+                       unit=config.units['WASTE']['EURAL_TREE'])
+
+
+def run_areas(config, areas=None):
+    """
+    Eural treemaps for all areas of the config level at once
+    returns {area: treemap}
+    """
+    print("\nWorking on eural treemaps...")
+    ewc2, ewc6 = import_descriptions(config)
+
+    print(f"\nImport national production for {config.year}...")
+    productions = utils.get_area_productions(
+        config,
+        level=config.level,
+        year=config.year,
+        role=var.ROLES['Ontvangst']['source'],
+        areas=areas
+    )
+
+    unit = config.units['WASTE']['EURAL_TREE']
+    return {
+        area: get_treemap(df, ewc2=ewc2, ewc6=ewc6, unit=unit)
+        for area, df in productions.items()
+    }
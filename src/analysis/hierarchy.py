@@ -0,0 +1,89 @@
+class Node:
+    """
+    Hierarchy level with amounts
+    amount: amount assigned to the level itself (None if never assigned)
+    total: amount of the level including all lower levels
+    """
+    __slots__ = ['name', 'children', 'amount', 'total']
+
+    def __init__(self, name):
+        self.name = name
+        self.children = {}
+        self.amount = None
+        self.total = 0
+
+
+class Hierarchy:
+    """
+    Material hierarchy as a trie of level names,
+    aggregates amounts while inserting
+    """
+
+    def __init__(self, root='Totaal'):
+        self.root = Node(root)
+
+    def add(self, node, name):
+        """
+        get or create child level of node
+        """
+        child = node.children.get(name)
+        if child is None:
+            child = node.children[name] = Node(name)
+        return child
+
+    def insert(self, levels, amount=0):
+        """
+        add amount to lowest level of path
+        """
+        node = self.root
+        node.total += amount
+        for name in levels:
+            node = self.add(node, name)
+            node.total += amount
+        node.amount = (node.amount or 0) + amount
+
+    def close(self):
+        """
+        move amounts of intermediate levels
+        to an extra '(andere)' lower level
+        """
+        for parent, node in list(self.walk()):
+            if node.children and node.amount is not None:
+                other = self.add(node, f'{node.name} (andere)')
+                other.amount = other.total = node.amount
+                node.amount = None
+        return self
+
+    def merge(self, other):
+        """
+        add levels of another hierarchy (without amounts)
+        """
+        def merge_nodes(node, add):
+            for name, child in add.children.items():
+                merge_nodes(self.add(node, name), child)
+        merge_nodes(self.root, other.root)
+        return self
+
+    def walk(self):
+        """
+        iterate (parent, node) depth first
+        """
+        stack = [(None, self.root)]
+        while stack:
+            parent, node = stack.pop()
+            yield parent, node
+            stack.extend(
+                (node, child) for child in reversed(node.children.values())
+            )
+
+    def names(self):
+        """
+        distinct level names depth first
+        """
+        return list(dict.fromkeys(node.name for parent, node in self.walk()))
+
+    def sums(self):
+        """
+        total amounts per level name
+        """
+        return {node.name: node.total for parent, node in self.walk()}
@@ -1,117 +1,116 @@
-from src.analysis import utils
+from src.analysis import utils, stage_cache
+from src.analysis.hierarchy import Hierarchy
 import pandas as pd
 import variables as var
 import os
 
 
-# VARIABLES
-VARS = {
-    'INPUT_DIR': var.INPUT_DIR,
-    'AREA_DIR': var.AREA_DIR,
-    'AREA': var.AREA,
-    'LEVEL': var.LEVEL,
-    'YEAR': var.YEAR,
-    'COROP_FILE': var.COROP_FILE,
-    'COROPS': var.COROPS,
-    'OUTPUT_DIR': var.OUTPUT_DIR,
-    'TRANSITION_AGENDAS_UNIT': var.UNITS['MATERIALS']['TRANSITION_AGENDAS'],
-    'MATERIAL_TREE_UNIT': var.UNITS['MATERIALS']['MATERIAL_TREE']
-}
-
-DATA = {}
 ROLES = var.ROLES
 PREFIXES = var.PREFIXES
-POLYGON = None
-EWC_CLASSIFS = {}
-MATERIAL_TREE = {}
 
 
-def process_lma():
+def process_lma(config, data, material_tree, polygon=None, ewc_classifs={}):
+    """
+    LMA transition agendas & material sankey
+    config: analysis settings -> Config
+    data: results to add graphs to
+    material_tree: material trees to add waste tree to
+    """
     # process LMA ontvangst
     for typ in ['Ontvangst']:
         # data prefix
-        level = PREFIXES[VARS['LEVEL']]
+        level = PREFIXES[config.level]
         datatype = f"{PREFIXES[typ]} afval"
-        period = VARS['YEAR']
+        period = config.year
 
         # import file
         print(f'\nImport {typ}...')
-        path = f"{VARS['INPUT_DIR']}/{VARS['AREA_DIR']}/LMA/processed"
-        filename = f"{path}/{typ.lower()}_{VARS['AREA'].lower()}_{VARS['YEAR']}_full.csv"
-        df = pd.read_csv(filename, low_memory=False)
+        path = f"{config.area_dir}/LMA/processed"
+        filename = f"{path}/{typ.lower()}_{config.area.lower()}_{config.year}_full.csv"
+        df = utils.read_lma(config, filename)
 
         # add areas to roles
         print('Add areas to roles...')
         source = ROLES[typ]['source']  # source role
-        df = utils.add_areas(df,
-                             areas=POLYGON,
+        df = utils.add_areas(config, df,
+                             areas=polygon,
                              role=source,
-                             admin_level=VARS['LEVEL'])
+                             admin_level=config.level)
 
         # add classifications
-        for name, classif in EWC_CLASSIFS.items():
+        for name, classif in ewc_classifs.items():
             df = utils.add_classification(df, classif, name=name,
                                           left_on='EuralCode',
                                           right_on='ewc')
 
         # TRANSITION AGENDAS
-        DATA.setdefault('transition_agendas', []).append({
+        data.setdefault('transition_agendas', []).append({
             'level': level,
             'period': period,
             'type': datatype,
             **utils.get_classification_graphs(df,
                                               source=source,
-                                              level=VARS['LEVEL'],
-                                              area=VARS['AREA'],
+                                              level=config.level,
+                                              area=config.area,
                                               klass='productgroepen',
-                                              unit=VARS['TRANSITION_AGENDAS_UNIT'])
+                                              unit=config.units['MATERIALS']['TRANSITION_AGENDAS'])
         })
 
         # MATERIAL SANKEY
         # also retrieve data for material tree
-        data, hierarchy, sums = \
+        sankey, hierarchy, sums = \
             utils.get_material_sankey(df,
                                       source=source,
-                                      level=VARS['LEVEL'],
-                                      area=VARS['AREA'],
-                                      unit=VARS['MATERIAL_TREE_UNIT'])
-        DATA.setdefault('material_sankey', []).append({
+                                      level=config.level,
+                                      area=config.area,
+                                      unit=config.units['MATERIALS']['MATERIAL_TREE'])
+        data.setdefault('material_sankey', []).append({
             'level': level,
             'period': period,
             'type': datatype,
-            **data
+            **sankey
         })
 
         # store material tree data
-        MATERIAL_TREE['afval'] = {
+        material_tree['afval'] = {
             'hierarchy': hierarchy,
             'sums': sums
         }
 
 
-def process_cbs():
-    print('\nImport CBS data...')
-    # data prefix
-    level = 'COROP'
-    datatype = 'goederen'
-    period = VARS['YEAR']
+def cbs_files(config):
+    """
+    tables & classifications read by get_cbs_graphs
+    """
+    return [
+        f"{config.output_dir}/tables/all_data/NON_FE.parquet",
+        f"{config.data_dir}/ontology/npce_productgroepen.xlsx",
+        f"{config.data_dir}/ontology/cbs_materials.csv",
+    ]
+
 
+@stage_cache.memoize(files=cbs_files, settings=['level', 'year', 'corops'])
+def get_cbs_graphs(config):
+    """
+    CBS transition agendas, material sankey & goods tree
+    returns (agendas, sankey, tree)
+    """
+    print('\nImport CBS data...')
     # DMI -> kt (million kg)
-    filename = f'{var.OUTPUT_DIR}/all_data.xlsx'
-    df = pd.read_excel(filename)
+    df = utils.read_sheet(config, 'all_data', 'NON_FE')
     df['Gewicht_KG'] = df['DMI'] * 10 ** 6
     df['Gewicht_KG'] = df['Gewicht_KG'].astype('int64')
 
     # filter by year & COROPS
     # exclude afval and total sums
     df = df[
-        (df['Jaar'] == VARS['YEAR']) &
-        (df['Regionaam'].isin(VARS['COROPS']))
+        (df['Jaar'] == config.year) &
+        (df['Regionaam'].isin(config.corops))
     ]
 
     # import cbs classifications
     pg = pd.read_excel(
-        f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/ontology/npce_productgroepen.xlsx",
+        f"{config.data_dir}/ontology/npce_productgroepen.xlsx",
         sheet_name='goederen'
     )
     pg["productgroepen"] = pg["productgroepen"].apply(
@@ -122,7 +121,7 @@ def process_cbs():
     cbs_classifs = {
         'productgroepen': pg,
         'materials': pd.read_csv(
-            f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/ontology/cbs_materials.csv",
+            f"{config.data_dir}/ontology/cbs_materials.csv",
             low_memory=False, sep=';'
         )
     }
@@ -135,58 +134,65 @@ def process_cbs():
 
     # TRANSITION AGENDAS
     # filter CBS input
-    DATA.setdefault('transition_agendas', []).append({
-        'level': level,
-        'period': period,
-        'type': datatype,
-        **utils.get_classification_graphs(df,
-                                          area=VARS['COROPS'],
-                                          klass='productgroepen',
-                                          unit=VARS['TRANSITION_AGENDAS_UNIT'])
-    })
+    agendas = utils.get_classification_graphs(df,
+                                              area=config.corops,
+                                              klass='productgroepen',
+                                              unit=config.units['MATERIALS']['TRANSITION_AGENDAS'])
 
     # MATERIAL SANKEY
     # also retrieve data for material tree
-    data, hierarchy, sums = \
+    sankey, hierarchy, sums = \
         utils.get_material_sankey(df,
-                                  level=VARS['LEVEL'],
-                                  area=VARS['COROPS'],
-                                  unit=VARS['MATERIAL_TREE_UNIT'])
-    DATA.setdefault('material_sankey', []).append({
+                                  level=config.level,
+                                  area=config.corops,
+                                  unit=config.units['MATERIALS']['MATERIAL_TREE'])
+
+    return agendas, sankey, {
+        'hierarchy': hierarchy,
+        'sums': sums
+    }
+
+
+def process_cbs(config, data, material_tree):
+    """
+    CBS transition agendas & material sankey
+    config: analysis settings -> Config
+    data: results to add graphs to
+    material_tree: material trees to add goods tree to
+    """
+    # data prefix
+    level = 'COROP'
+    datatype = 'goederen'
+    period = config.year
+
+    agendas, sankey, tree = get_cbs_graphs(config)
+    data.setdefault('transition_agendas', []).append({
+        'level': level,
+        'period': period,
+        'type': datatype,
+        **agendas
+    })
+    data.setdefault('material_sankey', []).append({
         'level': level,
         'period': period,
         'type': datatype,
-        **data
+        **sankey
     })
 
     # store material tree data
-    MATERIAL_TREE['goederen'] = {
-        'hierarchy': hierarchy,
-        'sums': sums
-    }
-
+    material_tree['goederen'] = tree
 
-def merge_material_trees(unit='kg'):
-    # reset dic to only nested dics
-    # to allow merge
-    def reset_nested(dic):
-        for key in dic.keys():
-            if isinstance(dic[key], dict):
-                reset_nested(dic[key])
-            else:
-                dic[key] = {}
-        return dic
 
+def merge_material_trees(material_tree, unit='kg'):
     # merge material tree hierarchies
-    hierarchy = {}
-    for typ, item in MATERIAL_TREE.items():
-        new_hierarchy = reset_nested(item['hierarchy'])
-        hierarchy = utils.merge_nested(new_hierarchy, hierarchy)
+    hierarchy = Hierarchy()
+    for typ, item in material_tree.items():
+        hierarchy.merge(item['hierarchy'])
 
     # add up amounts for each hierarchy level
     sums = {}
-    for typ, item in MATERIAL_TREE.items():
-        for k in utils.flatten_nested(hierarchy):
+    for typ, item in material_tree.items():
+        for k in hierarchy.names():
             sums.setdefault(k, []).append({
                 "type": typ,
                 "value": utils.kg_to_unit(
@@ -210,7 +216,7 @@ def merge_material_trees(unit='kg'):
     #         tree.setdefault("children", []).append(item)
     #     return tree
     # tree = update_tree({}, hierarchy)["children"][0]
-    # DATA[f"province\tall\tmaterial_tree\t{VARS['YEAR']}"] = [{
+    # DATA[f"province\tall\tmaterial_tree\t{config.year}"] = [{
     #     "data": tree
     # }]
 
@@ -219,33 +225,28 @@ def merge_material_trees(unit='kg'):
         'afval': 'amount_waste',
         'goederen': 'amount_goods'
     }
-    def tree_to_table(dic, parent=None, table=[], id=1):
-        for key in dic.keys():
-            item = {
-                'key': id,
-                'material': key,
-                'parent': parent,
-                "unit": unit
-            }
-            for sum in sums[key]:
-                item[terms[sum['type']]] = sum['value']
-            table.append(item)
-            id += 1
-            if isinstance(dic[key], dict):
-                table, id = tree_to_table(dic[key], parent=key, table=table, id=id)
-        return table, id
-    table, id = tree_to_table(hierarchy)
-    DATA['material_table'] = [{
+    table = []
+    for key, (parent, node) in enumerate(hierarchy.walk(), start=1):
+        item = {
+            'key': key,
+            'material': node.name,
+            'parent': parent.name if parent is not None else None,
+            "unit": unit
+        }
+        for sum in sums[node.name]:
+            item[terms[sum['type']]] = sum['value']
+        table.append(item)
+    return [{
         "data": table,
     }]
 
 
-def material_hightlights():
+def material_hightlights(config, material_tree):
     highlights = {}
-    unit = var.UNITS['MATERIALS']['HIGHLIGHTS']
+    unit = config.units['MATERIALS']['HIGHLIGHTS']
 
     # renewable goods (Goederen -> Organisch -> Biotisch)
-    sums = MATERIAL_TREE['goederen']['sums']
+    sums = material_tree['goederen']['sums']
     highlights['renewable_goods'] = {
         'amount': round(utils.kg_to_unit(sums['Biotisch'], unit=unit), 1),
         'unit': unit,
@@ -253,7 +254,7 @@ def material_hightlights():
     }
 
     # not renewable waste (Afval -> Biotisch)
-    sums = MATERIAL_TREE['afval']['sums']
+    sums = material_tree['afval']['sums']
     highlights['renewable_waste'] = {
         'amount': round(utils.kg_to_unit(sums['Biotisch'], unit='kt'), 1),
         'unit': 'kt',
@@ -261,34 +262,34 @@ def material_hightlights():
     }
 
     # wood - renewable waste (Afval -> Organisch -> Biotisch -> Hout)
-    sums = MATERIAL_TREE['afval']['sums']
+    sums = material_tree['afval']['sums']
     highlights['wood_renewable_waste'] = {
         'amount': round(utils.kg_to_unit(sums['Hout'], unit='kt'), 1),
         'unit': 'kt',
         'pct': round(sums['Hout'] / sums['Biotisch'] * 100, 1)
     }
 
-    DATA['material_highlights'] = highlights
+    return highlights
 
 
-def run():
+def run(config):
     # start analysis
     print('MATERIALS ANALYSIS')
-    print('VARIABLES:')
-    for name, value in VARS.items():
-        print(f'{name}={value}')
+    print('CONFIG:')
+    print(config)
+
+    data = {}
+    material_tree = {}
 
     # import areas
     # import province polygon
-    global POLYGON
-    POLYGON = utils.import_areas(level=VARS['LEVEL'])
-    POLYGON = POLYGON[POLYGON['name'] == VARS['AREA']]
-    assert len(POLYGON) == 1
+    polygon = utils.import_areas(config, level=config.level)
+    polygon = polygon[polygon['name'] == config.area]
+    assert len(polygon) == 1
 
     # import ewc classifications
-    global EWC_CLASSIFS
     pg = pd.read_excel(
-        f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/ontology/npce_productgroepen.xlsx",
+        f"{config.data_dir}/ontology/npce_productgroepen.xlsx",
         sheet_name='afval'
     )
     pg["productgroepen"] = pg["productgroepen"].apply(
@@ -296,26 +297,26 @@ def run():
             ["Consumptie" if "Consumptie" in p else p for p in map(str.strip, str(x).split("&"))]
         )
     )
-    EWC_CLASSIFS = {
+    ewc_classifs = {
         'productgroepen': pg,
         'materials': pd.read_csv(
-            f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/ontology/ewc_materials.csv",
+            f"{config.data_dir}/ontology/ewc_materials.csv",
             low_memory=False, sep=';'
         )
     }
 
     # process LMA data
-    process_lma()
+    process_lma(config, data, material_tree, polygon=polygon, ewc_classifs=ewc_classifs)
 
     # process CBS data
-    if len(VARS['COROPS']):
-        process_cbs()
+    if len(config.corops):
+        process_cbs(config, data, material_tree)
 
     # material highlights
-    if len(VARS['COROPS']):
-        material_hightlights()
+    if len(config.corops):
+        data['material_highlights'] = material_hightlights(config, material_tree)
 
     # merge material trees
-    merge_material_trees(unit=VARS['MATERIAL_TREE_UNIT'])
+    data['material_table'] = merge_material_trees(material_tree, unit=config.units['MATERIALS']['MATERIAL_TREE'])
 
-    return DATA
\ No newline at end of file
+    return data
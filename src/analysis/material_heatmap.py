@@ -1,8 +1,8 @@
 import pandas as pd
 import variables as var
+from src.analysis import utils
 
 
-FILEPATH = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/monitor_data/data"
 crm_names = ['Antimoon', 'Beryllium', 'Chroom', 'Kobalt', 'Cokeskolen', 'Fluoriet', 'Fosfor', 'Indium', 'Lithium',
              'Molybdeen', 'Grafiet', 'Niobium', 'Silicium', 'Zilver', 'Tin', 'Titanium', 'Wolfraam', 'Vanadium', 'Zink',
              'Aluminium', 'Barieten', 'Bentoniet', 'Boor', 'Koper', 'Diatomiet', 'Veldspaat', 'Gallium', 'Germanium',
@@ -11,7 +11,6 @@ crm_names = ['Antimoon', 'Beryllium', 'Chroom', 'Kobalt', 'Cokeskolen', 'Fluorie
              'Osmium', 'Palladium', 'Platina', 'Rhodium', 'Ruthenium', 'Cerium',
              'Europium', 'Gadolinium', 'Lanthanum', 'Neodymium', 'Praseodymium',
              'Samarium', 'Scandium', 'Dysprosium', 'Terbium', 'Ytterbium', 'Yttrium']
-materials = None
 
 
 def correct_car_crm_fractions(data):
@@ -22,24 +21,24 @@ def correct_car_crm_fractions(data):
     return data
 
 
-def calculate_crm_shares_per_province():
+def calculate_crm_shares_per_province(config):
     cn_code_col = 'CN2020_CODE'
 
-    crm_contents = pd.read_csv(f'{FILEPATH}/TNO/CN_CRM_typical_shares.csv', delimiter=';', decimal=',')
+    crm_contents = pd.read_csv(f'{config.monitor_dir}/TNO/CN_CRM_typical_shares.csv', delimiter=';', decimal=',')
     crm_contents[crm_contents.isna()] = 0
     crm_contents = correct_car_crm_fractions(crm_contents)
-    good_weights = pd.read_excel(f'{FILEPATH}/TNO/CN_goederen_totalen_2020.xlsx', sheet_name='Goederen_totalen_2020')
+    good_weights = pd.read_excel(f'{config.monitor_dir}/TNO/CN_goederen_totalen_2020.xlsx', sheet_name='Goederen_totalen_2020')
     good_weights = good_weights[['CN_8D', 'Final_count_kg']]
     good_weights['CN_8D'] = good_weights['CN_8D'].astype(str)
 
-    cn_to_nst_code = pd.read_excel(f'{FILEPATH}/geoFluxus/NST2007_CN2020_Table.xlsx')
+    cn_to_nst_code = pd.read_excel(f'{config.monitor_dir}/geoFluxus/NST2007_CN2020_Table.xlsx')
     cn_to_nst_code = cn_to_nst_code[[cn_code_col, 'NST2007_CODE']]
     cn_to_nst_code[cn_code_col] = cn_to_nst_code[cn_code_col].str.replace(' ', '')
     # print(cn_to_nst_code[cn_to_nst_code[cn_code_col].astype(str).str.len() != 8])
     # print(cn_to_nst_code)
     #cn_to_nst_code[cn_code_col] = cn_to_nst_code['CN2024_CODE'].astype(str).zfill(8)
-    dmi = pd.read_excel(f'{var.OUTPUT_DIR}/all_data.xlsx', sheet_name='ALL')[['Goederengroep', 'Regionaam', 'Jaar', 'DMI']]
-    dmi = dmi[dmi['Jaar'] == var.YEAR]
+    dmi = utils.read_sheet(config, 'all_data', 'ALL')[['Goederengroep', 'Regionaam', 'Jaar', 'DMI']]
+    dmi = dmi[dmi['Jaar'] == config.year]
 
 
     good_weights = pd.merge(good_weights, cn_to_nst_code, how='left', left_on='CN_8D', right_on=cn_code_col).drop(columns=cn_code_col)
@@ -48,7 +47,7 @@ def calculate_crm_shares_per_province():
     # print(good_weights['Final_count_kg'][good_weights['CN_8D'].isna() | good_weights[cn_code_col].isna()].sum())
     good_weights['Final_count_kg'][good_weights['Final_count_kg'].isna()] = 0
 
-    cbs_names_to_nst = pd.read_excel(f'{FILEPATH}/geoFluxus/CBS_names.xlsx', sheet_name='CBS_code_merger')
+    cbs_names_to_nst = pd.read_excel(f'{config.monitor_dir}/geoFluxus/CBS_names.xlsx', sheet_name='CBS_code_merger')
     cbs_names_to_nst = cbs_names_to_nst[['Goederengroep_naam', 'NST_code']]
     print(cbs_names_to_nst)
     nst_total_weights = good_weights.groupby('NST2007_CODE')['Final_count_kg'].sum()
@@ -75,10 +74,10 @@ def calculate_crm_shares_per_province():
 
     for i in crm_names:
         crm_in_goods[i] = crm_in_goods[i].astype(float) * crm_in_goods['good_distribution_per_nst']
-    crm_in_goods.to_excel(f'{FILEPATH}/goods_crm_fractions.xlsx')
+    crm_in_goods.to_excel(f'{config.monitor_dir}/goods_crm_fractions.xlsx')
     crm_per_nst_code = crm_in_goods.groupby('NST2007_CODE')[crm_names].sum()
     #print(crm_per_nst_code)
-    crm_per_nst_code.to_excel(f'{FILEPATH}/crm_fractions.xlsx')
+    crm_per_nst_code.to_excel(f'{config.monitor_dir}/crm_fractions.xlsx')
     dmi = pd.merge(dmi, cbs_names_to_nst, left_on='Goederengroep', right_on='Goederengroep_naam')
 
     dmi['NST_code'] = dmi['NST_code'].str.split(', ')
@@ -114,7 +113,7 @@ def calculate_crm_shares_per_province():
     return crm_per_province
 
 
-def plot_heatmap(dat, mat_inds, prov=None, values=None):
+def plot_heatmap(dat, mat_inds, materials=(), prov=None, values=None):
     indicators = mat_inds[mat_inds['Materiaal'].isin(materials)]
     indicators = indicators.sort_values(by='product', ascending=False)
     indicators = indicators[~indicators['Materiaal'].isna()]
@@ -172,7 +171,7 @@ def export_highlights(viz_data):
     }
 
 
-def export_overview(viz_data):
+def export_overview(config, viz_data):
     overview_data = []
     for idx, row in viz_data.iterrows():
         overview_data.append({
@@ -182,15 +181,15 @@ def export_overview(viz_data):
         })
 
     return {
-        "level": var.PREFIXES[var.LEVEL],
-        "period": var.YEAR,
-        "name": var.AREA,
+        "level": var.PREFIXES[config.level],
+        "period": config.year,
+        "name": config.area,
         "unit": "%",
         "values": overview_data
     }
 
 
-def export_heatmap(viz_data):
+def export_heatmap(config, viz_data, materials=()):
     # export data
     heatmap_materials = [col for col in viz_data.columns if col in materials]
     heatmap_data = {}
@@ -206,21 +205,21 @@ def export_heatmap(viz_data):
         heatmap_data[row['Goederengroep']] = data
 
     return {
-        "level": var.PREFIXES[var.LEVEL],
-        "period": var.YEAR,
-        "name": var.AREA,
+        "level": var.PREFIXES[config.level],
+        "period": config.year,
+        "name": config.area,
         "unit": "%",
         "materials": heatmap_materials,
         "values": heatmap_data
     }
 
 
-def run():
+def run(config):
     # CALCULATE DATA
-    data = calculate_crm_shares_per_province()
-    data.to_excel(f'{var.OUTPUT_DIR}/material_contents.xlsx')
+    data = calculate_crm_shares_per_province(config)
+    utils.write_sheets(config, 'material_contents', {'data': data.reset_index()})
 
-    indicators = pd.read_excel(f'{FILEPATH}/geoFluxus/EU CRM table.xlsx')
+    indicators = pd.read_excel(f'{config.monitor_dir}/geoFluxus/EU CRM table.xlsx')
     indicators['product'] = indicators['Economic Importance (EI)'] * indicators['Supply Risk (SR)']
 
     # PLOT MATERIALS
@@ -228,21 +227,20 @@ def run():
     plt_indicators = plt_indicators.sort_values('product')
     plt_indicators = plt_indicators[~plt_indicators['Materiaal'].isna()]
     criticals = plt_indicators[(indicators['Economic Importance (EI)'] >= 2.8) & (indicators['Supply Risk (SR)'] >= 1)]
-    global materials
     materials = list(criticals['Materiaal'].dropna())
 
-    euro_waarde = pd.read_excel(f'{var.OUTPUT_DIR}/euro_data_all.xlsx', sheet_name='ALL')
-    euro_waarde = euro_waarde[euro_waarde['Jaar'] == var.YEAR]
+    euro_waarde = utils.read_sheet(config, 'euro_data_all', 'ALL')
+    euro_waarde = euro_waarde[euro_waarde['Jaar'] == config.year]
     euro_waarde['Inkoop_waarde'] = euro_waarde['Invoer_nationaal'] + euro_waarde['Invoer_internationaal']
     euros = euro_waarde[['Regionaam', 'Goederengroep', 'Inkoop_waarde']]
 
     # PLOT MATERIALS
-    viz_data = plot_heatmap(data, indicators, prov=var.COROPS[0], values=euros)
+    viz_data = plot_heatmap(data, indicators, materials=materials, prov=config.corops[0], values=euros)
     viz_data = viz_data[viz_data['row_sum'] != 0]
     viz_data = compute_crm_value(viz_data, criticals)
 
     return {
         'highlights': export_highlights(viz_data),
-        'material_overview': export_overview(viz_data),
-        'raw_materials': export_heatmap(viz_data)
+        'material_overview': export_overview(config, viz_data),
+        'raw_materials': export_heatmap(config, viz_data, materials=materials)
     }
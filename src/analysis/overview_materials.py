@@ -1,12 +1,11 @@
-import pandas as pd
 import variables as var
+from src.analysis import utils
 import seaborn as sns
 from seaborn.regression import _RegressionPlotter
 
 
 PROJ_START = 2015
 PROJ_END = 2030
-DATA = {}
 
 
 def regression(func, fig, *args, **kwargs):
@@ -82,7 +81,8 @@ def get_projected_y(x1, x2, y1, y2, x):
     return y1 + m * (x - x1)
 
 
-def visualise_per_province(data, indicator=None):
+def visualise_per_province(data, indicator=None, proj_end=PROJ_END):
+    results = {}
     for goal, goal_data in data.items():
         viz_data = goal_data.groupby(['Regionaam', 'Jaar']).sum().reset_index()
 
@@ -93,13 +93,12 @@ def visualise_per_province(data, indicator=None):
         grid, yhat, err_bands = regression(sns.regplot, fig, "Jaar", indicator, truncate=False)
         goal_value = viz_data[viz_data['Jaar'] == PROJ_START + 1][indicator].values[0] / 2
         proj_y = yhat[-1]
-        if PROJ_END != var.PROJ_END:
+        if PROJ_END != proj_end:
             proj_y = get_projected_y(x1=PROJ_START,x2=PROJ_END,
                                      y1=yhat[0],y2=yhat[-1],
-                                     x=var.PROJ_END)
+                                     x=proj_end)
 
-        item = DATA.setdefault(indicator.lower(), {})
-        item[goal.lower()] = {
+        results[goal.lower()] = {
             "points": {
                 "period": viz_data["Jaar"].to_list(),
                 "values": viz_data[indicator].to_list()
@@ -107,7 +106,7 @@ def visualise_per_province(data, indicator=None):
             "line": {
                 "x1": PROJ_START,
                 "y1": yhat[0],
-                "x2": var.PROJ_END,
+                "x2": proj_end,
                 "y2": proj_y
             },
             "area": {
@@ -123,8 +122,10 @@ def visualise_per_province(data, indicator=None):
             # }} if goal == 'abiotic' and indicator in ['DMC'] else {})
         }
 
+    return results
 
-def run():
+
+def run(config):
     # import dmi/dmc data
     data = {}
     for indicator in [
@@ -133,7 +134,7 @@ def run():
         'rmc', 'rmc_ab',
         'rmi', 'rmi_ab'
     ]:
-        data[indicator] = pd.read_excel('../json/dmi_dmc.xlsx', sheet_name=indicator)
+        data[indicator] = utils.read_sheet(config, 'dmi_dmc', indicator)
 
     indicators = {
         'DMC': {'total': data['dmc'], 'abiotic': data['dmc_ab']},
@@ -141,15 +142,17 @@ def run():
         'RMC': {'total': data['rmc'], 'abiotic': data['rmc_ab']},
         'RMI': {'total': data['rmi'], 'abiotic': data['rmi_ab']}
     }
+    results = {}
     for indicator, data in indicators.items():
-        visualise_per_province(data, indicator=indicator)
+        results[indicator.lower()] = visualise_per_province(data, indicator=indicator,
+                                                          proj_end=config.proj_end)
 
     return {
-        "level": var.PREFIXES[var.LEVEL],
-        "period": var.YEAR,
-        "name": var.AREA,
+        "level": var.PREFIXES[config.level],
+        "period": config.year,
+        "name": config.area,
         "unit": "kt",
-        "data": DATA,
+        "data": results,
     }
 
 
@@ -4,25 +4,12 @@ import variables as var
 import numpy as np
 
 
-# VARIABLES
-VARS = {
-    'INPUT_DIR': var.INPUT_DIR,
-    'AREA_DIR': var.AREA_DIR,
-    'AREA': var.AREA,
-    'LEVEL': var.LEVEL,
-    'POSTCODES': var.POSTCODES,
-    'YEAR': var.YEAR,
-    'COROP_FILE': var.COROP_FILE,
-    'COROPS': var.COROPS,
-    'OUTPUT_DIR': var.OUTPUT_DIR,
-    'OVERVIEW_SANKEY_UNIT': var.UNITS['OVERVIEW']['OVERVIEW_SANKEY']
-}
-
-
-DATA = {}
-
-
-def process_lma(polygon, ewc_classifs, on_agendas=False):
+def process_lma(config, polygon, ewc_classifs, household_kg=None, on_agendas=False):
+    """
+    LMA sankey branches
+    returns {flow: values}
+    """
+    unit = config.units['OVERVIEW']['OVERVIEW_SANKEY']
     STROMEN = {
         ('Herkomst', True, 'Verwerker', True): 'Productie van afval binnen de regio',
         ('Herkomst', True, 'Verwerker', False): 'Export van afval',
@@ -32,6 +19,8 @@ def process_lma(polygon, ewc_classifs, on_agendas=False):
         # ('EerstAfnemer', False, 'Verwerker', True): 'Hergebruik van afval van elders binnen de regio'
     }
 
+    results = {}
+
     # process LMA ontvangst & afgifte
     for typ in [
         'Ontvangst',
@@ -39,19 +28,19 @@ def process_lma(polygon, ewc_classifs, on_agendas=False):
     ]:
         # import file
         print(f'\nImport {typ}...')
-        path = f"{VARS['INPUT_DIR']}/{VARS['AREA_DIR']}/LMA/processed"
-        filename = f"{path}/{typ.lower()}_{VARS['AREA'].lower()}_{VARS['YEAR']}_full.csv"
-        df = pd.read_csv(filename, low_memory=False)
+        path = f"{config.area_dir}/LMA/processed"
+        filename = f"{path}/{typ.lower()}_{config.area.lower()}_{config.year}_full.csv"
+        df = utils.read_lma(config, filename)
 
         # add areas to roles
         print('Add areas to roles...')
         source = var.ROLES[typ]['source']  # source role
         target = var.ROLES[typ]['target']  # target role
         for role in [source, target]:
-            df = utils.add_areas(df,
+            df = utils.add_areas(config, df,
                                  areas=polygon,
                                  role=role,
-                                 admin_level=VARS['LEVEL'])
+                                 admin_level=config.level)
 
         # add classifications
         for name, classif in ewc_classifs.items():
@@ -60,24 +49,32 @@ def process_lma(polygon, ewc_classifs, on_agendas=False):
                                           right_on='ewc')
 
         # SANKEY
+        # amounts per branch (& agenda) in one pass,
+        # household waste (200301) apart for the correction
+        crosstab = utils.sankey_crosstab(
+            df, source=source, target=target,
+            level=config.level, area=config.area,
+            by={
+                'household': df['EuralCode'] == '200301',
+                **({'agendas': df['agendas']} if on_agendas else {})
+            }
+        )
+        household_crosstab = crosstab[crosstab['household']]
+
         # source in / target in
         flows, amounts = [], []
         flows.append(STROMEN[(source, True, target, True)])
         lokaal = utils.compute_sankey_branch(
-            df,
-            source=source, source_in=True,
-            target=target, target_in=True,
-            level=VARS['LEVEL'], area=VARS['AREA'],
-            unit=VARS['OVERVIEW_SANKEY_UNIT'],
+            crosstab,
+            source_in=True, target_in=True,
+            area=config.area, unit=unit,
             on_agendas=on_agendas
         )
         print(f'Lokaal: {lokaal}')
         lokaal_200301 = utils.compute_sankey_branch(
-            df[df['EuralCode'] == '200301'],
-            source=source, source_in=True,
-            target=target, target_in=True,
-            level=VARS['LEVEL'], area=VARS['AREA'],
-            unit=VARS['OVERVIEW_SANKEY_UNIT'],
+            household_crosstab,
+            source_in=True, target_in=True,
+            area=config.area, unit=unit,
             on_agendas=on_agendas
         )
         print(f'Lokaal (200301): {lokaal_200301}')
@@ -85,26 +82,22 @@ def process_lma(polygon, ewc_classifs, on_agendas=False):
         # source in / target out
         flows.append(STROMEN[(source, True, target, False)])
         export = utils.compute_sankey_branch(
-            df,
-            source=source, source_in=True,
-            target=target, target_in=False,
-            level=VARS['LEVEL'], area=VARS['AREA'],
-            unit=VARS['OVERVIEW_SANKEY_UNIT'],
+            crosstab,
+            source_in=True, target_in=False,
+            area=config.area, unit=unit,
             on_agendas=on_agendas
         )
         print(f'Export: {export}')
         export_200301 = utils.compute_sankey_branch(
-            df[df['EuralCode'] == '200301'],
-            source=source, source_in=True,
-            target=target, target_in=False,
-            level=VARS['LEVEL'], area=VARS['AREA'],
-            unit=VARS['OVERVIEW_SANKEY_UNIT'],
+            household_crosstab,
+            source_in=True, target_in=False,
+            area=config.area, unit=unit,
             on_agendas=on_agendas
         )
         print(f'Export (200301): {export_200301}')
 
-        if var.EXCLUDE_HOUSEHOLD:
-            household = utils.kg_to_unit(var.HOUSEHOLD_KG, unit=VARS['OVERVIEW_SANKEY_UNIT'])
+        if config.exclude_household:
+            household = utils.kg_to_unit(household_kg, unit=unit)
             print(f'Household: {household}')
             if on_agendas:
                 # remove household from comnsuptiegoederen agenda
@@ -129,17 +122,14 @@ def process_lma(polygon, ewc_classifs, on_agendas=False):
 
         # source out / target in
         flows.append(STROMEN[(source, False, target, True)])
-        amounts.append(utils.compute_sankey_branch(df,
-                                                   source=source, source_in=False,
-                                                   target=target, target_in=True,
-                                                   level=VARS['LEVEL'], area=VARS['AREA'],
-                                                   unit=VARS['OVERVIEW_SANKEY_UNIT'],
+        amounts.append(utils.compute_sankey_branch(crosstab,
+                                                   source_in=False, target_in=True,
+                                                   area=config.area, unit=unit,
                                                    on_agendas=on_agendas))
 
         for flow, amount in zip(flows, amounts):
-            item = DATA.setdefault("flows", {})
             key = flow.lower().replace(' ', '_')
-            item[key] = {
+            results[key] = {
                 **({
                     "values": amount["values"],
                     "agendas": amount["agendas"]
@@ -148,11 +138,17 @@ def process_lma(polygon, ewc_classifs, on_agendas=False):
                 })
             }
 
+    return results
 
-def process_cbs(on_agendas=False):
+
+def process_cbs(config, on_agendas=False):
+    """
+    CBS sankey branches
+    returns {flow: values}
+    """
     # stromen -> million kg
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/monitor_data/data/CBS"
-    filename = f"{path}/{VARS['COROP_FILE']}.csv"
+    path = f"{config.monitor_dir}/CBS"
+    filename = f"{path}/{config.corop_file}.csv"
 
     df = pd.read_csv(filename, low_memory=False, sep=',')
     df['Gewicht_KG'] = df['Brutogew'] * 10 ** 6  # mln kg -> kg
@@ -161,8 +157,8 @@ def process_cbs(on_agendas=False):
     # filter by year & COROPS
     # exclude afval and total sums
     df = df[
-        (df['Jaar'] == VARS['YEAR']) &
-        (df['Regionaam'].isin(VARS['COROPS'])) &
+        (df['Jaar'] == config.year) &
+        (df['Regionaam'].isin(config.corops)) &
         (~df['Goederengroep_naam'].str.contains('afval', case=False, na=False)) &
         (df['Gebruiksgroep_naam'] != 'Totaal')
     ]
@@ -170,7 +166,7 @@ def process_cbs(on_agendas=False):
     # import cbs classifications
     cbs_classifs = {}
     for classif in ['productgroepen']:
-        file_path = f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/ontology/npce_{classif}.xlsx"
+        file_path = f"{config.data_dir}/ontology/npce_{classif}.xlsx"
         cbs_classifs[classif] = pd.read_excel(file_path)
 
     # add classifications
@@ -180,7 +176,7 @@ def process_cbs(on_agendas=False):
                                       right_on='cbs')
 
     # SANKEY
-    unit = VARS['OVERVIEW_SANKEY_UNIT']
+    unit = config.units['OVERVIEW']['OVERVIEW_SANKEY']
     stromen = [
         'Aanbod_eigen_regio',
         'Invoer_internationaal',
@@ -188,13 +184,13 @@ def process_cbs(on_agendas=False):
         'Uitvoer_internationaal',
         'Uitvoer_nationaal',
     ]
+    item = {}
     for stroom in stromen:
-        item = DATA.setdefault("flows", {})
         key = stroom.lower().replace(' ', '_')
         if on_agendas:
             stroom_df = df[df['Stroom'] == stroom]
             result = utils.get_classification_graphs(stroom_df,
-                                                     area=VARS['COROPS'],
+                                                     area=config.corops,
                                                      klass='agendas',
                                                      unit=unit)
             item[key] = {
@@ -212,9 +208,8 @@ def process_cbs(on_agendas=False):
             }
 
     # lokale winning
-    all_data_file = f'{var.OUTPUT_DIR}/all_data.xlsx'
-    df = pd.read_excel(all_data_file)
-    df = df[df['Jaar'] == var.YEAR]
+    df = utils.read_sheet(config, 'all_data', 'NON_FE')
+    df = df[df['Jaar'] == config.year]
     df['Gewicht_KG'] = df['Winning'] * 10 ** 6
 
     # add classifications
@@ -225,7 +220,7 @@ def process_cbs(on_agendas=False):
 
     if on_agendas:
         result = utils.get_classification_graphs(df,
-                                                 area=VARS['COROPS'],
+                                                 area=config.corops,
                                                  klass='agendas',
                                                  unit=unit)
         item['lokale_winning'] = {
@@ -236,18 +231,20 @@ def process_cbs(on_agendas=False):
         item['lokale_winning'] = {
             "values": [utils.kg_to_unit(
                 df['Winning'].sum() * 10 ** 6,
-                unit=VARS['OVERVIEW_SANKEY_UNIT']
+                unit=unit
             )]
         }
 
+    return item
 
-def import_household_data(areas=None):
+
+def import_household_data(config, areas=None):
     """
     Import & ready CBS household data for processing
     """
 
     # add gemeente & provincie
-    path = f"{VARS['INPUT_DIR']}/{VARS['AREA_DIR']}/CBS"
+    path = f"{config.area_dir}/CBS"
     df = pd.read_excel(f"{path}/Huishoudelijk_Gemeenten.xlsx", sheet_name='Data')
     columns = list(df.columns)
     df = df.replace('?', np.nan)
@@ -271,79 +268,90 @@ def import_household_data(areas=None):
     return df
 
 
-def process_household(on_agendas=False):
-    if var.HOUSEHOLD_KG is not None:
-        household_data = var.HOUSEHOLD_KG
-    else:
-        # import postcodes
-        postcodes = pd.read_csv(
-            f"{VARS['INPUT_DIR']}/GEODATA/postcodes/{VARS['POSTCODES']}.csv",
-            low_memory=False
-        )
-        postcodes['PC4'] = postcodes['PC4'].astype(str)
-        gemeenten = postcodes[['Gemeente', 'Provincie']].drop_duplicates()
-        area_gemeenten = gemeenten[gemeenten[f"{VARS['LEVEL']}"] == VARS['AREA']]['Gemeente'].to_list()
-        print(f'AREA GEMEENTEN ({len(area_gemeenten)}): {sorted(area_gemeenten)}')
-
-        # import household data
-        print('\nImport household data...')
-        household_data = import_household_data(areas=gemeenten)
-        household_data = household_data.rename(columns={'Gebieden': 'Gemeente'})
-        household_data = household_data[household_data['Perioden'] == int(VARS['YEAR'])]
-        household_data = household_data[household_data[VARS['LEVEL']] == VARS['AREA']]
-
-        # total household waste
-        household_data['Gewicht_KG'] = household_data["Totaal aangeboden huishoudelijk afval [Kilo's per inwoner]"] \
-                                       * household_data['Inwoners']
-        household_data = household_data['Gewicht_KG'].sum()
-
-    item = DATA.setdefault("flows", {})
-    item["huishoudelijk_afval"] = {
-        "values": [
-            utils.kg_to_unit(
-                household_data,
-                unit=VARS['OVERVIEW_SANKEY_UNIT']
-            )
-        ],
-        **({'agendas': ['Consumptiegoederen']} if on_agendas else {})
+def get_household_kg(config):
+    """
+    household waste of the area (kg),
+    HOUSEHOLD_KG if set for the area, otherwise from CBS household data
+    """
+    if config.household_kg is not None:
+        return config.household_kg
+
+    # import postcodes
+    postcodes = pd.read_csv(
+        f"{config.input_dir}/GEODATA/postcodes/{config.postcodes}.csv",
+        low_memory=False
+    )
+    postcodes['PC4'] = postcodes['PC4'].astype(str)
+    gemeenten = postcodes[['Gemeente', 'Provincie']].drop_duplicates()
+    area_gemeenten = gemeenten[gemeenten[f"{config.level}"] == config.area]['Gemeente'].to_list()
+    print(f'AREA GEMEENTEN ({len(area_gemeenten)}): {sorted(area_gemeenten)}')
+
+    # import household data
+    print('\nImport household data...')
+    household_data = import_household_data(config, areas=gemeenten)
+    household_data = household_data.rename(columns={'Gebieden': 'Gemeente'})
+    household_data = household_data[household_data['Perioden'] == int(config.year)]
+    household_data = household_data[household_data[config.level] == config.area]
+
+    # total household waste
+    household_data['Gewicht_KG'] = household_data["Totaal aangeboden huishoudelijk afval [Kilo's per inwoner]"] \
+                                   * household_data['Inwoners']
+    return household_data['Gewicht_KG'].sum()
+
+
+def process_household(config, household_kg, on_agendas=False):
+    unit = config.units['OVERVIEW']['OVERVIEW_SANKEY']
+    return {
+        "huishoudelijk_afval": {
+            "values": [
+                utils.kg_to_unit(
+                    household_kg,
+                    unit=unit
+                )
+            ],
+            **({'agendas': ['Consumptiegoederen']} if on_agendas else {})
+        }
     }
 
 
-def run(on_agendas=False):
+def run(config, on_agendas=False):
     # start analysis
     print('OVERVIEW ANALYSIS')
-    print('VARIABLES:')
-    for name, value in VARS.items():
-        print(f'{name}={value}')
+    print('CONFIG:')
+    print(config)
 
     # import province polygon
-    polygon = utils.import_areas(level=VARS['LEVEL'])
-    polygon = polygon[polygon['name'] == VARS['AREA']]
+    polygon = utils.import_areas(config, level=config.level)
+    polygon = polygon[polygon['name'] == config.area]
     assert len(polygon) == 1
 
     # import ewc classifications
     ewc_classifs = {
         'productgroepen': pd.read_excel(
-            f"{VARS['INPUT_DIR']}/Database_LockedFiles/DATA/ontology/npce_productgroepen.xlsx",
+            f"{config.data_dir}/ontology/npce_productgroepen.xlsx",
             sheet_name='afval'
         )
     }
 
+    # household waste of the area
+    household_kg = get_household_kg(config)
+
     # process LMA data
-    process_lma(polygon, ewc_classifs, on_agendas=on_agendas)
+    flows = process_lma(config, polygon, ewc_classifs,
+                        household_kg=household_kg, on_agendas=on_agendas)
 
     # process CBS data
-    if len(VARS['COROPS']):
-        process_cbs(on_agendas=on_agendas)
+    if len(config.corops):
+        flows.update(process_cbs(config, on_agendas=on_agendas))
 
     # processe household data
-    process_household(on_agendas=on_agendas)
+    flows.update(process_household(config, household_kg, on_agendas=on_agendas))
 
     return {
-        **DATA,
-        'name': var.AREA,
-        'level': var.LEVEL,
-        'year': var.YEAR,
-        'unit': VARS['OVERVIEW_SANKEY_UNIT'],
-        'exclude_household': var.EXCLUDE_HOUSEHOLD
+        'flows': flows,
+        'name': config.area,
+        'level': config.level,
+        'year': config.year,
+        'unit': config.units['OVERVIEW']['OVERVIEW_SANKEY'],
+        'exclude_household': config.exclude_household
     }
\ No newline at end of file
@@ -1,35 +1,42 @@
-import variables as var
 import pandas as pd
 from src.analysis import utils
 
 
-DATA = {}
-
-
-def run(on_agendas=False):
-    unit = var.UNITS['OVERVIEW']['OVERVIEW_USAGE']
+def run(config, on_agendas=False):
+    unit = config.units['OVERVIEW']['OVERVIEW_USAGE']
 
     # stromen -> million kg
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/monitor_data/data/CBS"
-    filename = f"{path}/{var.COROP_FILE}.csv"
+    path = f"{config.monitor_dir}/CBS"
+    filename = f"{path}/{config.corop_file}.csv"
 
-    df = pd.read_csv(filename, low_memory=False, sep=',')
+    # read year & COROPS only
+    # exclude afval and total sums
+    df = utils.read_csv_filtered(
+        filename,
+        where=lambda df: (
+            (df['Jaar'] == config.year) &
+            (df['Regionaam'].isin(config.corops)) &
+            (~df['Goederengroep_naam'].str.contains('afval', case=False, na=False)) &
+            (df['Gebruiksgroep_naam'] != 'Totaal')
+        ),
+        usecols=[
+            'Jaar',
+            'Regionaam',
+            'Goederengroep_nr',
+            'Goederengroep_naam',
+            'Gebruiksgroep_naam',
+            'Stroom',
+            'Brutogew'
+        ],
+        low_memory=False, sep=','
+    )
     df['Gewicht_KG'] = df['Brutogew'] * 10 ** 6  # mln kg -> kg
     df['Gewicht_KG'] = df['Gewicht_KG'].astype('int64')
 
-    # filter by year & COROPS
-    # exclude afval and total sums
-    df = df[
-        (df['Jaar'] == var.YEAR) &
-        (df['Regionaam'].isin(var.COROPS)) &
-        (~df['Goederengroep_naam'].str.contains('afval', case=False, na=False)) &
-        (df['Gebruiksgroep_naam'] != 'Totaal')
-    ]
-
     # import cbs classifications
     cbs_classifs = {}
     for classif in ['productgroepen']:
-        file_path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/ontology/npce_{classif}.xlsx"
+        file_path = f"{config.data_dir}/ontology/npce_{classif}.xlsx"
         cbs_classifs[classif] = pd.read_excel(file_path)
 
     # add classifications
@@ -53,35 +60,36 @@ def run(on_agendas=False):
         'Verandering voorraden'
     ]
 
-    values = DATA.setdefault("values", {})
-    for usage in usages:
-        for stroom in stromen:
-            usage_df = df[
-                (df['Stroom'] == stroom) &
-                (df['Gebruiksgroep_naam'] == usage)
-            ]
-            usage_name = usage.replace('_', ' ')
-
-            if on_agendas:
-                values.setdefault(usage_name, []).append({
+    values = {}
+    if on_agendas:
+        groups = dict(list(df.groupby(['Gebruiksgroep_naam', 'Stroom'])))
+        for usage in usages:
+            for stroom in stromen:
+                usage_df = groups.get((usage, stroom), df.iloc[:0])
+                values.setdefault(usage.replace('_', ' '), []).append({
                     k: v for k, v in utils.get_classification_graphs(
                         usage_df,
-                        area=var.COROPS,
+                        area=config.corops,
                         klass='agendas',
                         unit=unit
                     ).items() if k in ["agendas", "values"]
                 })
-            else:
-                values.setdefault(usage_name, []).append(
-                    utils.kg_to_unit(usage_df['Gewicht_KG'].sum(), unit=unit)
-                )
+    else:
+        # amounts per usage & stroom
+        amounts = df.pivot_table(index='Gebruiksgroep_naam', columns='Stroom',
+                                 values='Gewicht_KG', aggfunc='sum', fill_value=0)\
+            .reindex(index=usages, columns=stromen, fill_value=0)
+        for usage, row in amounts.iterrows():
+            values[usage.replace('_', ' ')] = [
+                utils.kg_to_unit(amount, unit=unit) for amount in row
+            ]
 
     return {
         "level": "COROP",
-        "name": var.COROPS[0],
-        "period": var.YEAR,
+        "name": config.corops[0],
+        "period": config.year,
         "type": "goederen",
         "unit": unit,
         "usage": [stroom.replace('_', ' ') for stroom in stromen],
-        **DATA
+        "values": values
     }
@@ -1,7 +1,5 @@
 import pandas as pd
-import variables as var
-
-DATA = {}
+from src.analysis import utils
 
 
 def renewable_sum(df, indicator='DMI'):
@@ -18,13 +16,14 @@ def to_highlight(value, unit='kt'):
     }
 
 
-def run():
+def run(config):
+    DATA = {}
+
     # compute non-fossil indicators
-    path = fr"{var.OUTPUT_DIR}/dmi_dmc.xlsx"
     for indicator in ['dmi', 'rmi', 'dmc', 'rmc']:
-        df = pd.read_excel(path, sheet_name=indicator)
+        df = utils.read_sheet(config, 'dmi_dmc', indicator)
         DATA[indicator] = to_highlight(
-            df[df['Jaar'] == var.YEAR][indicator.upper()].sum()
+            df[df['Jaar'] == config.year][indicator.upper()].sum()
         )
 
     DATA['dmi_dmc'] = to_highlight(
@@ -33,21 +32,19 @@ def run():
     )
 
     # import fossil data
-    path = fr"{var.OUTPUT_DIR}/all_data.xlsx"
-    df = pd.read_excel(path, sheet_name='FE')
-    DATA['fe'] = df[df['Jaar'] == var.YEAR]['DMI'].sum()
+    df = utils.read_sheet(config, 'all_data', 'FE')
+    DATA['fe'] = df[df['Jaar'] == config.year]['DMI'].sum()
     DATA['dmi_fe'] = to_highlight(
         DATA['dmi'].get('value') + DATA['fe']
     )
 
     # import not-fossil data
-    path = fr"{var.OUTPUT_DIR}/all_data.xlsx"
-    df = pd.read_excel(path, sheet_name='NON_FE')
-    df = df[df['Jaar'] == var.YEAR]
+    df = utils.read_sheet(config, 'all_data', 'NON_FE')
+    df = df[df['Jaar'] == config.year]
     assert df['DMI'].sum() == DATA['dmi'].get('value')
 
     # import renewable
-    path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_hernieuwbaar.xlsx"
+    path = f"{config.data_dir}/ontology/npce_hernieuwbaar.xlsx"
     renewable = pd.read_excel(path)
     df = pd.merge(df, renewable, on='cbs')
 
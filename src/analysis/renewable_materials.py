@@ -3,7 +3,6 @@ import variables as var
 from src.analysis import utils
 
 
-DATA = {}
 PRODUCTS = [key for key in var.PRODUCTGROEPEN]
 RENEWABLES = [
     'hernieuwbaar',
@@ -15,23 +14,22 @@ RENEWABLES = [
 UNIT = 'kt'
 
 
-def process_cbs(indicator=None):
+def process_cbs(config, indicator=None):
     concats = []
     for sheet in ['NON_FE', 'FE']:
         # import non-fossil
-        filename = f'{var.OUTPUT_DIR}/all_data.xlsx'
-        df = pd.read_excel(filename, sheet_name=sheet)
+        df = utils.read_sheet(config, 'all_data', sheet)
 
         # merge with renewable
         # mark all fossil groups as fossil (for split goederen)
-        path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_hernieuwbaar.xlsx"
+        path = f"{config.data_dir}/ontology/npce_hernieuwbaar.xlsx"
         renewable = pd.read_excel(path)
         df = pd.merge(df, renewable, on='cbs')
         if sheet == 'FE':
             df['renewable'] = 'fe'
 
         # merge with product groups
-        path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_productgroepen.xlsx"
+        path = f"{config.data_dir}/ontology/npce_productgroepen.xlsx"
         productgroups = pd.read_excel(path, sheet_name='goederen')
         df = pd.merge(df, productgroups, on='cbs')
 
@@ -44,7 +42,7 @@ def process_cbs(indicator=None):
         'unit': UNIT
     }
     for product in PRODUCTS:
-        for year in var.DMI_YEARS:
+        for year in config.dmi_years:
             cats, year_df = utils.split_categories(
                 df[df['Jaar'] == year],
                 column='productgroepen',
@@ -60,11 +58,11 @@ def process_cbs(indicator=None):
                 prod_item = data['products'].setdefault(product, {})
                 year_item = prod_item.setdefault(year, []).append(value)
 
-    DATA[indicator.lower()] = data
+    return data
 
 
-def run():
-    process_cbs(indicator='DMI')
-    process_cbs(indicator='DMC')
-
-    return DATA
\ No newline at end of file
+def run(config):
+    return {
+        'dmi': process_cbs(config, indicator='DMI'),
+        'dmc': process_cbs(config, indicator='DMC')
+    }
\ No newline at end of file
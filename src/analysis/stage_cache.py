@@ -0,0 +1,133 @@
+import functools
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+from dataclasses import asdict
+import pandas as pd
+from src.analysis import utils
+
+
+# folder in the cache folder for memoized results
+FOLDER = 'stages'
+
+# package root, all code in it is part of the cache key
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@functools.lru_cache(maxsize=None)
+def file_digest(path, stamp):
+    """
+    content hash of a file (once per file version)
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """
+    content hash of the analysis code & variables
+    """
+    files = sorted(glob.glob(f'{ROOT}/src/**/*.py', recursive=True))
+    files.append(f'{ROOT}/variables.py')
+    return hashlib.sha1(
+        ''.join(file_digest(path, utils.file_stamp(path)) for path in files).encode()
+    ).hexdigest()
+
+
+def value_digest(value):
+    """
+    content hash of an argument
+    (dataframes by their values, other arguments by their repr)
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(value).values.tobytes())
+        digest.update(repr(value.dtypes if isinstance(value, pd.DataFrame) else value.dtype).encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+        return digest.hexdigest()
+    return hashlib.sha1(repr(value).encode()).hexdigest()
+
+
+def evict(folder, max_bytes):
+    """
+    remove least recently used results
+    until the folder fits in max_bytes
+    """
+    entries = []
+    for path in glob.glob(f'{folder}/*/*.pkl'):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    size = sum(entry[1] for entry in entries)
+    for mtime, nbytes, path in sorted(entries):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        size -= nbytes
+
+
+def memoize(files=None, settings=()):
+    """
+    Cache results of an analysis step in the cache folder,
+    keyed on the content of its arguments, its input files,
+    the config settings it depends on & the analysis code.
+    The step takes the run Config as 'config' argument.
+    files: function of the config returning the input files read by the step
+    settings: names of the config settings the result depends on
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            config = bound.arguments['config']
+
+            paths = sorted(files(config)) if files else []
+            parts = [name, code_version()]
+            parts.extend(f'{path}:{file_digest(path, utils.file_stamp(path))}' for path in paths)
+            parts.append(repr({key: asdict(config)[key] for key in settings}))
+            parts.extend(
+                f'{arg}:{value_digest(value)}'
+                for arg, value in bound.arguments.items()
+                if arg != 'config'
+            )
+            key = hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+            folder = f'{config.cache_dir}/{FOLDER}'
+            path = f'{folder}/{func.__qualname__}/{key}.pkl'
+            if os.path.exists(path):
+                try:
+                    with open(path, 'rb') as f:
+                        result = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    pass
+                else:
+                    os.utime(path)  # last use for eviction
+                    return result
+
+            result = func(*args, **kwargs)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f'{path}.{os.getpid()}', 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.{os.getpid()}', path)
+            evict(folder, config.stage_cache_gb * 10**9)
+
+            return result
+        return wrapper
+    return decorator
@@ -1,14 +1,31 @@
 import pandas as pd
 import geopandas as gpd
-import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import hashlib
 import json
-from src import _make_iterencode
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from src.analysis.hierarchy import Hierarchy
 import re
-import variables as var
 
 
-# parameters
-INPUT_DIR = var.INPUT_DIR
+# area shapefiles per administration level
+LEVELS = {
+    'Provincie': 'provincies',
+    'Gemeente': 'gemeenten'
+}
+
+# LMA columns stored as categoricals in the columnar cache
+LMA_CODES = [
+    'EuralCode',
+    'VerwerkingsmethodeCode'
+]
+
+# area-filtered datasets shared within shared_datasets() (per thread)
+SHARED = threading.local()
 
 
 def kg_to_unit(value, unit='kg', decimals=2):
@@ -24,6 +41,7 @@ def kg_to_unit(value, unit='kg', decimals=2):
     return value / converters[unit]
 
 
+@lru_cache(maxsize=None)
 def format_name(name):
     exclude = [
         'TransitieAgenda',
@@ -40,43 +58,344 @@ def format_name(name):
     return name
 
 
-def import_areas(level=None):
+def file_stamp(path):
+    """
+    stamp to detect changes of a source file
+    """
+    stat = os.stat(path)
+    return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+
+def cache_path(config, path, folder=None, ext='parquet'):
+    """
+    location of the cached copy of a source file
+    """
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return f'{config.cache_dir}/{folder}/{name}_{key}.{ext}'
+
+
+def read_cached(cached, stamp):
+    """
+    cached table if made from the current
+    version of its source (None otherwise)
+    """
+    if os.path.exists(cached):
+        metadata = pq.read_schema(cached).metadata or {}
+        if metadata.get(b'source') == stamp.encode():
+            return pd.read_parquet(cached)
+    return None
+
+
+def write_cached(df, cached, stamp):
+    """
+    store table with the stamp of its source
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **table.schema.metadata,
+        b'source': stamp.encode()
+    })
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    pq.write_table(table, f'{cached}.{os.getpid()}')
+    os.replace(f'{cached}.{os.getpid()}', cached)
+
+
+def read_lma(config, path):
+    """
+    Read LMA csv through a typed columnar cache
+    (converted on first read, refreshed when the csv changes)
+    """
+    cached = cache_path(config, path, folder='lma')
+    stamp = file_stamp(path)
+    df = read_cached(cached, stamp)
+    if df is not None:
+        return df
+
+    print(f'Convert {os.path.basename(path)} to cache...')
+    df = pd.read_csv(path, low_memory=False, dtype={'EuralCode': str})
+    df['EuralCode'] = df['EuralCode'].str.zfill(6)
+    for col in LMA_CODES:
+        df[col] = df[col].astype('category')
+    weights = df['Gewicht_KG']
+    if weights.notna().all() and (weights % 1 == 0).all():
+        df['Gewicht_KG'] = weights.astype('int64')
+
+    # keep source stamp for invalidation
+    write_cached(df, cached, stamp)
+
+    return df
+
+
+def read_csv_filtered(path, where=None, chunksize=10**6, **kwargs):
+    """
+    Read csv in chunks, keeping only rows matching where(chunk) -> mask
+    (memory scales with the selection instead of the file)
+    kwargs: pd.read_csv options (e.g. usecols to read only needed columns)
+    """
+    chunks = [
+        chunk[where(chunk)] if where is not None else chunk
+        for chunk in pd.read_csv(path, chunksize=chunksize, **kwargs)
+    ]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def aggregate_csv(path, by, values, chunksize=10**6, **kwargs):
+    """
+    Stream csv in chunks & sum values per group
+    (memory scales with the number of groups instead of the file)
+    by: columns to group by, values: columns to sum
+    kwargs: pd.read_csv options (e.g. dtype)
+    """
+    total = None
+    for chunk in pd.read_csv(path, usecols=by + values, chunksize=chunksize, **kwargs):
+        partial = chunk.groupby(by, observed=True)[values].sum()
+        total = partial if total is None else total.add(partial, fill_value=0)
+    if total is None:
+        return pd.DataFrame(columns=by + values)
+    return total.reset_index()
+
+
+def aggregate_lma(path, by=tuple(LMA_CODES), values=('Gewicht_KG',), chunksize=10**6):
+    """
+    Amounts of an LMA csv per group of codes,
+    for analyses needing only aggregates of national files
+    """
+    by, values = list(by), list(values)
+    df = aggregate_csv(path, by=by, values=values, chunksize=chunksize,
+                       dtype={**{col: str for col in by}, **{col: 'float64' for col in values}})
+    if 'EuralCode' in by:
+        df['EuralCode'] = df['EuralCode'].str.zfill(6)
+        df = df.groupby(by, as_index=False)[values].sum()
+    for col in values:
+        if (df[col] % 1 == 0).all():
+            df[col] = df[col].astype('int64')
+    return df
+
+
+def write_sheets(config, name, sheets, output_dir=None):
+    """
+    Store tables exchanged between scripts
+    as parquet files in OUTPUT_DIR/tables/{name}
+    (also as excel workbook if EXPORT_EXCEL)
+    """
+    output_dir = output_dir or config.output_dir
+    folder = f'{output_dir}/tables/{name}'
+    os.makedirs(folder, exist_ok=True)
+    for sheet, df in sheets.items():
+        df.to_parquet(f'{folder}/{sheet}.parquet', index=False)
+
+    if config.export_excel:
+        with pd.ExcelWriter(f'{output_dir}/{name}.xlsx', engine='openpyxl', mode='w') as writer:
+            for sheet, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet[:31], index=False)
+
+
+def read_sheet(config, name, sheet_name=None):
+    """
+    Read table stored with write_sheets
+    """
+    return pd.read_parquet(f'{config.output_dir}/tables/{name}/{sheet_name}.parquet')
+
+
+def import_rladder(config):
+    """
+    processing codes to benchmark groups
+    """
+    print("Import rladder...")
+    path = f"{config.data_dir}/descriptions/rhierarchy.xlsx"
+    rladder = pd.read_excel(path)
+    rladder = rladder[['processing_code', 'benchmark_group']]
+    rladder_names = {
+        r['benchmark_group'][0]: r['benchmark_group'][1:].strip()
+        for idx, r in rladder.iterrows()
+    }
+    rladder['benchmark_group'] = rladder['benchmark_group'].str[0]
+    return rladder, rladder_names
+
+
+def import_areas(config, level=None):
     """
     import area polygons
     for different administration level
     (municipalities, provinces etc.)
+    loaded once per shapefile, do not modify in place
     """
-    LEVELS = {
-        'Provincie': 'provincies',
-        'Gemeente': 'gemeenten'
-    }
-    level = LEVELS[level]
+    return read_areas(config.input_dir, LEVELS[level], config.year)
+
 
+@lru_cache(maxsize=None)
+def read_areas(input_dir, level, year):
     # load geometries
-    areas = gpd.read_file(f'{INPUT_DIR}/Database_LockedFiles/GEODATA/areas/{level}/{level}_{var.YEAR}.shp')
+    areas = gpd.read_file(f'{input_dir}/Database_LockedFiles/GEODATA/areas/{level}/{level}_{year}.shp')
     areas['centroid'] = areas['geometry'].centroid
 
     return areas
 
 
-def add_areas(flows, areas=None, role=None, admin_level=None):
+def locate_areas(config, locations, level=None):
+    """
+    Lookup table of locations (wkt) to area names
+    persisted per area shapefile & extended with new locations
+    """
+    path = f'{config.cache_dir}/locations/{LEVELS[level]}_{config.year}.parquet'
+    lookup = pd.read_parquet(path) if os.path.exists(path) \
+        else pd.DataFrame(columns=['wkt', 'name'])
+    lookup = lookup.set_index('wkt')['name']
+
+    # join only unknown locations with area polygons
+    new = pd.Index(locations.dropna().unique()).difference(lookup.index)
+    if len(new):
+        print(f'Locate {len(new)} new locations...')
+        new = pd.Series(new, name='wkt')
+        points = gpd.GeoDataFrame(new,
+                                  geometry=gpd.GeoSeries.from_wkt(new),
+                                  crs='EPSG:4326')
+        areas = import_areas(config, level=level)[['name', 'geometry']]
+        points = gpd.sjoin(points, areas, how='left', predicate='within')
+        points = points.drop_duplicates('wkt').set_index('wkt')['name']
+        lookup = pd.concat([lookup, points])
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lookup.reset_index().to_parquet(f'{path}.{os.getpid()}', index=False)
+        os.replace(f'{path}.{os.getpid()}', path)
+
+    return lookup
+
+
+def add_areas(config, flows, areas=None, role=None, admin_level=None):
     """
     Add administrative areas to roles
     (point to polygon)
     """
-    columns = list(flows)
+    # find areas of distinct locations
+    locations = flows[f'{role}_Location']
+    names = locations.map(locate_areas(config, locations, level=admin_level))
+
+    # keep only requested areas
+    names = names.where(names.isin(areas['name']))
 
-    # join geolocation with area polygons
-    flows['wkt'] = gpd.GeoSeries.from_wkt(flows[f'{role}_Location'])
-    flows = gpd.GeoDataFrame(flows, geometry='wkt', crs='EPSG:4326')
-    flows = gpd.sjoin(flows, areas, how='left', predicate='within')
+    return flows.assign(**{f'{role}_{admin_level}': names})
 
-    # keep only original dataframe columns & role area
-    flows[f'{role}_{admin_level}'] = flows['name']
-    columns.append(f'{role}_{admin_level}')
-    flows = flows[columns]
 
-    return flows
+@contextmanager
+def shared_datasets():
+    """
+    Share area-filtered datasets between the analyses
+    run within the block (in the same thread);
+    datasets are kept until the block exits,
+    unless released earlier by their last consumer (release_production)
+    """
+    depth = getattr(SHARED, 'depth', 0)
+    if not depth:
+        SHARED.datasets = {}
+    SHARED.depth = depth + 1
+    try:
+        yield
+    finally:
+        SHARED.depth -= 1
+        if not SHARED.depth:
+            del SHARED.datasets
+
+
+def shared():
+    """
+    datasets shared in the current block
+    (a throwaway dict outside shared_datasets())
+    """
+    return getattr(SHARED, 'datasets', {})
+
+
+def release_production(config, level=None, year=None, role='Herkomst'):
+    """
+    drop the shared national & area datasets of a year
+    (for the last analysis using them in the block)
+    """
+    datasets = shared()
+    for kind in ['national', 'areas']:
+        datasets.pop((config.input_dir, kind, level, year, role), None)
+
+
+def get_production(config, area=None, level=None, year=None, role='Herkomst'):
+    """
+    LMA ontvangst of an area for a year
+    filtered on production within the area
+    (do not modify, the dataset might be shared)
+    """
+    datasets = shared()
+    key = (config.input_dir, area, level, year, role)
+    if key in datasets:
+        return datasets[key]
+
+    # import area dataset
+    path = f"{config.input_dir}/Monitors/{level}{area}/LMA/processed"
+    df = read_lma(config, f"{path}/ontvangst_{area.lower()}_{year}_full.csv")
+
+    # import area polygon
+    polygon = import_areas(config, level=level)
+    polygon = polygon[polygon['name'] == area]
+    assert len(polygon) == 1
+
+    # ONLY PRODUCTION
+    df = add_areas(config, df, role=role, areas=polygon, admin_level=level)
+    df = df[df[f"{role}_{level}"] == area]
+
+    datasets[key] = df
+    return df
+
+
+def get_national_production(config, level=None, year=None, role='Herkomst'):
+    """
+    National LMA ontvangst for a year
+    with the area of production for all areas of a level
+    (do not modify, the dataset might be shared)
+    """
+    datasets = shared()
+    key = (config.input_dir, 'national', level, year, role)
+    if key in datasets:
+        return datasets[key]
+
+    path = f"{config.data_dir}/LMA/ontvangst/processed"
+    df = read_lma(config, f"{path}/ontvangst_{year}_full.csv")
+
+    # locate all areas at once
+    df = add_areas(config, df, role=role, areas=import_areas(config, level=level), admin_level=level)
+    df[f"{role}_{level}"] = df[f"{role}_{level}"].astype('category')
+
+    datasets[key] = df
+    return df
+
+
+def get_area_productions(config, level=None, year=None, role='Herkomst', areas=None):
+    """
+    LMA ontvangst of all areas of a level for a year
+    filtered on production within each area
+    areas: names of areas to keep (default: all)
+    returns {area: production}
+    """
+    datasets = shared()
+    key = (config.input_dir, 'areas', level, year, role)
+    if key not in datasets:
+        df = get_national_production(config, level=level, year=year, role=role)
+        datasets[key] = dict(iter(df.groupby(f"{role}_{level}", observed=True)))
+
+    return select_areas(datasets[key], areas)
+
+
+def select_areas(results, areas=None):
+    """
+    keep results of requested areas
+    """
+    if areas is None:
+        return results
+    return {area: results[area] for area in areas if area in results}
+
+
+def area_dir(config, area=None, level=None):
+    """
+    output folder of an area in batch mode
+    """
+    return f'{config.output_dir}/{level}{area}'
 
 
 def add_classification(df, classif, name=None,
@@ -95,27 +414,36 @@ def add_classification(df, classif, name=None,
     return df
 
 
-def compute_sankey_branch(flows,
-                          source=None, source_in=True,
-                          target=None, target_in=True,
-                          level=None, area=None,
-                          unit='kg',
+def sankey_crosstab(flows, source=None, target=None, level=None, area=None, by={}):
+    """
+    Amounts of flows per source & target in/out of the area
+    (and extra properties) in a single aggregation,
+    to read all sankey branches from with compute_sankey_branch
+    by: extra properties {name: values per flow}
+    """
+    keys = [
+        flows[f'{source}_{level}'].isin([area]).rename('source_in'),
+        flows[f'{target}_{level}'].isin([area]).rename('target_in'),
+        *[pd.Series(values, index=flows.index, name=name) for name, values in by.items()]
+    ]
+    return flows.groupby(keys, dropna=False, observed=True)['Gewicht_KG']\
+        .sum().reset_index()
+
+
+def compute_sankey_branch(crosstab,
+                          source_in=True, target_in=True,
+                          area=None, unit='kg',
                           on_agendas=False):
     """
     Compute sankey brances
     for LMA & CBS data
+    crosstab: flow amounts per source & target in/out of the area
+              (see sankey_crosstab)
     """
-    binnen = {
-        True: 'binnen',
-        False: 'buiten'
-    }
-
-    conditions = []
-    for role, is_in in zip([source, target], [source_in, target_in]):
-        condition = flows[f'{role}_{level}'].isin([area])
-        if not is_in: condition = ~condition
-        conditions.append(condition)
-    new_flows = flows[np.bitwise_and.reduce(conditions)]
+    new_flows = crosstab[
+        (crosstab['source_in'] == source_in) &
+        (crosstab['target_in'] == target_in)
+    ]
     if on_agendas:
         amount = get_classification_graphs(
             new_flows,
@@ -130,20 +458,20 @@ def compute_sankey_branch(flows,
 
 def split_categories(df, column=None, amount='Gewicht_KG', extra=[]):
     # split amounts for synthetic categories
-    split_rows = []
-    for idx, row in df.iterrows():
-        categories = [c.strip() for c in row[column].split('&')]
-        if len(categories) > 1:
-            value_per_cat = row[amount] / len(categories)
-            for cat in categories:
-                split_rows.append({
-                    column: cat,
-                    amount: value_per_cat,
-                    **{col: row[col] for col in extra}
-                })
-        else:
-            split_rows.append(row[[column, amount, *extra]].to_dict())
-    cleaned_data = pd.DataFrame(data=split_rows)
+    # (on distinct categories, amounts are summed first)
+    cleaned_data = df[[column, amount, *extra]]\
+        .groupby([column, *extra], as_index=False, observed=True)[amount].sum()
+    categories = cleaned_data[column].str.split('&')
+    counts = categories.str.len()
+    split = counts > 1
+    if split.any():
+        cleaned_data[amount] = cleaned_data[amount].where(
+            ~split, cleaned_data[amount] / counts
+        )
+    cleaned_data[column] = categories
+    cleaned_data = cleaned_data.explode(column)
+    split = split.reindex(cleaned_data.index)
+    cleaned_data.loc[split, column] = cleaned_data.loc[split, column].str.strip()
 
     # group by
     groups = cleaned_data.groupby([
@@ -164,8 +492,7 @@ def get_classification_graphs(df, source=None,
     Create graphs based on ontology classifications
     for LMA & CBS data
     """
-    groupby = []
-    flows = df.copy()
+    flows = df
     if source is not None:
         # filter source in areas
         if isinstance(area, str):
@@ -173,20 +500,14 @@ def get_classification_graphs(df, source=None,
         elif isinstance(area, list):
             in_area = flows[f'{source}_{level}'].isin(area)
         flows = flows[in_area]
-        flows = flows.rename(columns={source: 'source'})
-
-        groupby.append(f'{source}_{level}',)
 
     # specify categories
     # flows[klass] = flows[klass].apply(format_name)
     cats, groups = split_categories(flows, column=klass)
 
     # get results for categories
-    values = []
-    for cat in cats:
-        row = groups[groups[klass] == cat]
-        value = row['Gewicht_KG'].values[0] if len(row) else 0
-        values.append(kg_to_unit(value, unit=unit))
+    amounts = groups.set_index(klass)['Gewicht_KG']
+    values = kg_to_unit(amounts.reindex(cats, fill_value=0), unit=unit).tolist()
 
     return {
         "name": ','.join(area) if isinstance(area, list) else area,
@@ -222,19 +543,6 @@ def merge_nested(add, ref):
     return res
 
 
-def search_nested(key, dic):
-    """
-    search key in nested dict
-    """
-    if key in dic:
-        return dic[key]
-    for v in dic.values():
-        if isinstance(v, dict):
-            a = search_nested(key, v)
-            if a is not None: return a
-    return None
-
-
 def path_nested(key, dic, parents=[]):
     """
     search key in nested dict
@@ -248,17 +556,6 @@ def path_nested(key, dic, parents=[]):
     return None
 
 
-def update_nested(dic, key, value):
-    """
-    update key in nested dict
-    """
-    for k, v in dic.items():
-        if key == k:
-            dic[k] = value
-        elif isinstance(v, dict):
-            update_nested(v, key, value)
-
-
 def update_tree(tree, dic, extra):
     for key in dic.keys():
         item = {
@@ -273,103 +570,53 @@ def update_tree(tree, dic, extra):
     return tree
 
 
-def flatten_nested(dic, keys=set()):
-    """
-    get all keys of nested dict
-    """
-    for key in dic.keys():
-        keys.add(key)
-        if isinstance(dic[key], dict):
-            flatten_nested(dic[key], keys=keys)
-    return sorted(list(keys))
-
-
 def get_hierarchy(df):
     """
     Get material hierarchy & amounts for lowest levels
     """
-    sums = {}  # contains amounts for lowest levels
-    hierarchy = {}  # level hierarchy
-    for idx, row in df.iterrows():
+    hierarchy = Hierarchy()
+    for materials, amount in zip(df['materials'], df['Gewicht_KG']):
         # split materials
-        materials = row['materials'].split('&')
+        materials = materials.split('&')
 
         # retrieve material intersection
         # to define levels
         levels = materials[0].split('+')
         for material in materials[1:]:
             search = material.split('+')
-            new = []
-            for item in levels:
-                if item in search:
-                    new.append(item)
-            levels = new
+            levels = [item for item in levels if item in search]
         if len(materials) > 1:
             value = f'{levels[-1]} (gemengd)' if len(levels) else 'Gemengd'
             levels.append(value)
         levels = [format_name(lvl) for lvl in levels]
 
-        # convert into hierarchy
-        tree = build_nested(levels)
-
-        # merge with existent hierarchy
-        hierarchy = merge_nested(tree, hierarchy)
-
-        # save amount for lowest level
-        sums[levels[-1]] = sums.get(levels[-1], 0) + row['Gewicht_KG']
-
-    # populate hierarchy with amounts
-    hierarchy = {"Totaal": hierarchy}
-    for material in sums.keys():
-        obj = search_nested(material, hierarchy)
-        if not len(obj):
-            update_nested(hierarchy, material, sums[material])
-        else:
-            obj = search_nested(material, hierarchy)
-            obj[f'{material} (andere)'] = sums[material]
-            update_nested(hierarchy, material, obj)
-
-    return hierarchy
-
+        # add amount to lowest level
+        hierarchy.insert(levels, amount)
 
-def close_sankey_sums(nivo, dic, sums):
-    """
-    Close sums for sankey nodes
-    """
-    for key in dic.keys():
-        nivo['nodes'].add(key)
-        if isinstance(dic[key], dict):
-            children = dic[key].keys()
-            sums[key] = 0
-            for child in children:
-                nivo['links'].add((key, child))
-                close_sankey_sums(nivo, dic[key], sums)
-                sums[key] += sums[child]
-        else:
-            sums[key] = dic[key]
-    return nivo, sums
+    # amounts of intermediate levels to '(andere)'
+    return hierarchy.close()
 
 
 def get_sankey(hierarchy, unit='kg'):
     """
     Convert material hierarchy to nivo sankey
     """
+    sums = hierarchy.sums()
+    links = dict.fromkeys(
+        (parent.name, node.name)
+        for parent, node in hierarchy.walk() if parent is not None
+    )
     nivo = {
-        'nodes': set(),
-        'links': set()
+        'nodes': [{
+            'id': node
+        } for node in hierarchy.names()],
+        'links': [{
+            'source': source,
+            'target': target,
+            'value': kg_to_unit(sums[target], unit=unit),
+            'unit': unit
+        } for source, target in links]
     }
-    nivo, sums = close_sankey_sums(nivo, hierarchy, {})
-    nivo['nodes'] = [{
-        'id': node
-    } for node in nivo['nodes']]
-    nivo['links'] = [{
-        'source': source,
-        'target': target
-    } for source, target in nivo['links']]
-    for link in nivo['links']:
-        link['value'] = kg_to_unit(sums[link['target']], unit=unit)
-        link['unit'] = unit
-        # print(f'{link["source"]}[{sums[link["target"]]}]{link["target"]}')
 
     return nivo, sums
 
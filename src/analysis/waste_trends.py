@@ -1,28 +1,13 @@
 import variables as var
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 import numpy as np
+import os
 import re
+from functools import partial
 from src.analysis import utils
 
 
-VARS = {
-    'INPUT_DIR': var.INPUT_DIR,
-    'AREA_DIR': var.AREA_DIR,
-    'AREA': var.AREA,
-    'LEVEL': var.LEVEL,
-    'YEARS': var.ACTIONS_YEARS,
-    'QUARTER': var.QUARTER,
-    'OUTPUT_DIR': var.OUTPUT_DIR
-}
-
-AREA = VARS['AREA']
-LEVEL = VARS['LEVEL']
-ALL_YEARS = "all_years"
-LAST_QUARTER = "last_quarter"
 UNKNOWN = 'Onbekend'
-DATA = {}
-UNIT = var.UNITS['WASTE']['TRENDS']
 
 
 def to_json(value):
@@ -30,26 +15,60 @@ def to_json(value):
     return value
 
 
-def get_flows(year=None):
+def get_filename(config, year=None):
     """
-    Import flows from 'data/flows'
+    LMA ontvangst file of the area for a year
     """
-    path = f"{VARS['INPUT_DIR']}/{VARS['AREA_DIR']}/LMA/processed"
-    filename = f"{path}/ontvangst_{VARS['AREA'].lower()}_{year}_full.csv"
+    path = f"{config.area_dir}/LMA/processed"
+    return f"{path}/ontvangst_{config.area.lower()}_{year}_full.csv"
 
-    return pd.read_csv(filename, low_memory=False)
 
+def locate_flows(config, filename, areas=None):
+    """
+    flows of an LMA file with the area of production
+    """
+    source = var.ROLES['Ontvangst']['source']
+    flows = utils.read_lma(config, filename)
+    return utils.add_areas(config, flows, role=source, areas=areas, admin_level=config.level)
+
+
+def get_monthly(config, filename, read):
+    """
+    Monthly production per area & process of an LMA file,
+    stored in the cache folder until the file changes:
+    files of closed years are aggregated once,
+    only the file of the current year is ingested again on new quarters
+    read: function returning the flows of the file with the area of production
+    """
+    source = var.ROLES['Ontvangst']['source']
+    on = f'{source}_{config.level}'
 
-def save(flows, datatype=None, prop=None, attrs={}, unit='t'):
+    # areas are located with the polygons of the analysis year
+    cached = utils.cache_path(config, filename, folder=f'trends/{config.level}_{config.year}')
+    stamp = utils.file_stamp(filename)
+    monthly = utils.read_cached(cached, stamp)
+    if monthly is not None:
+        return monthly
+
+    print(f"Aggregate {os.path.basename(filename)}...")
+    groupby = [on, 'MeldPeriodeJAAR', 'MeldPeriodeMAAND', 'VerwerkingsmethodeCode']
+    monthly = read().groupby(groupby, as_index=False, observed=True)['Gewicht_KG'].sum()
+    monthly[on] = monthly[on].astype(str)
+    utils.write_cached(monthly, cached, stamp)
+
+    return monthly
+
+
+def save(data, flows, area=None, level=None, datatype=None, prop=None, attrs={}, unit='t'):
     X, Y = [], []
     for flow in flows:
         X.append(flow['period'])
         Y.append(to_json(flow['amount']))
-    item = DATA.setdefault(datatype, {})
+    item = data.setdefault(datatype, {})
     item[prop] = {
         **{
-            'name': AREA,
-            'level': LEVEL,
+            'name': area,
+            'level': level,
             'period': X,
             'value': Y,
             'unit': unit
@@ -58,207 +77,184 @@ def save(flows, datatype=None, prop=None, attrs={}, unit='t'):
     }
 
 
-def compute_trends(df, on=[], values=[], datatype=None, prop=None, attrs={},
-                   per_months=12, add_graph=True, add_trends=True):
+def period_grid(config, df, on=[], per_months=12):
     """
-    Analyse trends for areas on different timeframe
+    Amounts per period of the analysis years
+    for each combination of properties
     df: flow dataframe -> DataFrame
     on: properties to groupby -> list
-    values: contains list of values for each property to select -> list
     per_months: timeframe to analyse (year=12, quarter=3 etc.) -> int
+    returns properties x (year, period) amounts
+            (NaN for periods without flows) -> DataFrame
     """
-    # columns to select & groupby
-    period_formatter = \
-        lambda period, year: f'Q{period}/{str(year)[-2:]}' \
-            if per_months == 3 else year
-
-    columns = on.copy()
-    columns.extend([
-        'MeldPeriodeJAAR',
-        'Gewicht_TN'
-    ])
-    groupby = columns[:-1]
+    years = list(config.actions_years)
+    periods = range(1, 12 // per_months + 1)
 
-    # split months into periods
-    months = list(range(1, 13))
-    periods = [
-        months[i: i + per_months] for i in range(0, len(months), per_months)
+    # periods up to the quarter of the last year
+    columns = pd.MultiIndex.from_tuples([
+        (year, period) for year in years for period in periods
+        if year < years[-1] or period <= config.quarter
+    ], names=['MeldPeriodeJAAR', 'Periode'])
+
+    df = df[df['MeldPeriodeJAAR'].isin(years) & df['MeldPeriodeMAAND'].between(1, 12)]
+    grid = df.assign(Periode=(df['MeldPeriodeMAAND'] - 1) // per_months + 1)\
+        .groupby(on + ['MeldPeriodeJAAR', 'Periode'], dropna=False, observed=True)['Gewicht_TN'].sum()\
+        .unstack(['MeldPeriodeJAAR', 'Periode'])
+
+    return grid.reindex(columns=columns)
+
+
+def trend_lines(X, Y):
+    """
+    Least squares lines through the rows of Y
+    X: times -> array (n)
+    Y: amounts per series -> array (series x n)
+    returns line values at first & last time per series
+    """
+    X = np.asarray(X, dtype=float)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    dx = X - X.mean()
+    denom = dx @ dx
+    # single period: flat line
+    slope = (Y - Y.mean(axis=1, keepdims=True)) @ dx / denom if denom \
+        else np.zeros(len(Y))
+    intercept = Y.mean(axis=1) - slope * X.mean()
+    return intercept + slope * X[0], intercept + slope * X[-1]
+
+
+def period_labels(grid, per_months=12):
+    """
+    times & labels of the grid periods
+    """
+    X = [year * 12 + period * per_months for year, period in grid.columns]
+    labels = [
+        f'Q{period}/{str(year)[-2:]}' if per_months == 3 else year
+        for year, period in grid.columns
     ]
+    return X, labels
 
-    # aggregate into periods of months for each year
-    df_new = []
-    for year in VARS['YEARS']:
-        # aggregate per period & store to new df
-        for idx, period in enumerate(periods):
-            df_q = df[
-                (df['MeldPeriodeJAAR'] == year) &
-                (df['MeldPeriodeMAAND'].isin(period))
-                ]
-            df_q = df_q[columns].groupby(groupby).sum().reset_index()
-            df_q['Periode'] = idx + 1
-            df_new.append(df_q)
-
-    # concatenate for all periods & years
-    df_new = pd.concat(df_new)
-
-    # find unique values for properties if not provided
-    new_values = []
-    for idx, value in enumerate(values):
-        if not value:
-            value = df_new.drop_duplicates(on[idx])
-            value = value[on[idx]].to_list()
-        new_values.append(value)
-
-    # iterate permutations for all properties & values
-    # first value is always the area
-    for area in new_values[0]:
-        # form conditions & select flows for current permutation
-        conditions = [df_new[on[0]] == area]
-        for key, val in zip(on[1:], new_values[1:]):
-            conditions.append(df_new[key].isin(val))
-        flows = df_new.loc[np.bitwise_and.reduce(conditions)]
-        flows = flows[['MeldPeriodeJAAR', 'Periode', 'Gewicht_TN']]\
-            .groupby(['MeldPeriodeJAAR', 'Periode']).sum().reset_index()
-
-        # save data for graphs
-        # add individual data to RESULTS
-        if add_graph:
-            to_save = []
-            for year in VARS['YEARS']:
-                for period in range(1, len(periods) + 1):
-                    if year < VARS['YEARS'][-1] or period <= VARS['QUARTER']:
-                        amount = flows[(flows['MeldPeriodeJAAR'] == year) &
-                                       (flows['Periode'] == period)]['Gewicht_TN']
-                        amount = amount.values[0] if len(amount) else 0
-                        item = {
-                            'amount': amount,
-                            'period': period_formatter(period, year),
-                        }
-                        to_save.append(item)
-            save(to_save, datatype=datatype, prop=prop, attrs=attrs)
-
-        # run linear regression
-        if add_trends:
-            # prepare data
-            X, Y = [], []
-            for year in VARS['YEARS']:
-                for period in range(1, len(periods) + 1):
-                    if year < VARS['YEARS'][-1] or period <= VARS['QUARTER']:
-                        time = year * 12 + period * per_months
-                        amount = flows[(flows['MeldPeriodeJAAR'] == year) &
-                                       (flows['Periode'] == period)]['Gewicht_TN']
-                        amount = amount.values[0] if len(amount) else 0
-                        X.append(time)
-                        Y.append(amount)
-            X = np.array(X).reshape(-1, 1)
-
-            # linear regression
-            reg = LinearRegression().fit(X, Y)
-
-            # compute initial & final amount based on model
-            Y_initial = reg.predict(np.array(X[0]).reshape(-1, 1))[0]
-            Y_final = reg.predict(np.array(X[-1]).reshape(-1, 1))[0]
-            # add regression for production graph
-            if datatype == 'production_graph':
-                DATA[datatype]['line'] = {
-                    'x1': to_save[0]['period'],
-                    'y1': Y_initial,
-                    'x2': to_save[-1]['period'],
-                    'y2': Y_final,
-                }
-                return
-
-            # overall change)
-            amount_change = (Y_final - Y_initial) / len(VARS['YEARS'])
-            pct_change = ((Y_final - Y_initial) / abs(Y_initial)) / len(VARS['YEARS']) * 100 \
-                if Y_initial else np.nan
-            item = DATA.setdefault(datatype, {})
-            item[ALL_YEARS] = {
-                'amount': to_json(amount_change),
-                'unit': UNIT,
-                'pct': to_json(pct_change),
-                'period': str(VARS['YEARS'][0])
-            }
-
-            # change to same quarter, last year
-            Y_final, Y_initial = Y[-1], Y[-5]
-            amount_change = Y_final - Y_initial
-            pct_change = (Y_final - Y_initial) / Y_initial * 100 if Y_initial else np.nan
-            item[LAST_QUARTER] = {
-                'amount': to_json(amount_change),
-                'unit': UNIT,
-                'pct': to_json(pct_change),
-                'period': f"Q{VARS['QUARTER']}/{str(VARS['YEARS'][-2])[-2:]}"
-            }
-
-
-def run():
-    ROLES = var.ROLES
-    PREFIXES = var.PREFIXES
 
+def production_trends(config, flows, areas=None, rladder_names={}):
+    """
+    production graphs (amount per year & regression)
+    per benchmark group for areas,
+    all series are aggregated & fitted at once
+    areas: names of areas (default: all areas in flows)
+    returns {area: trends}
+    """
+    on = f'Herkomst_{config.level}'
+    grid = period_grid(config, flows, on=[on, 'benchmark_group'], per_months=12)
+    totals = period_grid(config, flows, on=[on], per_months=12)
+    X, labels = period_labels(grid, per_months=12)
+    if areas is None:
+        areas = totals.index.dropna().to_list()
+
+    # series per area: benchmark groups & total
+    groups = list(rladder_names)
+    series = pd.concat([
+        grid.reindex(pd.MultiIndex.from_product([areas, groups])),
+        totals.reindex(areas).set_index(pd.MultiIndex.from_product([areas, ['total']]))
+    ])
+    Y_initial, Y_final = trend_lines(X, np.nan_to_num(series.values))
+    lines = pd.DataFrame({'y1': Y_initial, 'y2': Y_final}, index=series.index)
+
+    results = {}
+    for area in areas:
+        data = {}
+        for prop in groups + ['total']:
+            to_save = [
+                {'amount': amount, 'period': label}
+                for amount, label in zip(series.loc[(area, prop)].values, labels)
+            ]
+            save(data, to_save, area=area, level=config.level,
+                 datatype='production_graph', prop=prop)
+
+        # regression of the total production
+        data['production_graph']['line'] = {
+            'x1': labels[0],
+            'y1': lines.loc[(area, 'total'), 'y1'],
+            'x2': labels[-1],
+            'y2': lines.loc[(area, 'total'), 'y2'],
+        }
+        results[area] = data
+
+    return results
+
+
+def run(config):
     # start analysis
     print('ACTIONS ANALYSIS')
-    print('VARIABLES:')
-    for name, value in VARS.items():
-        print(f'{name}={value}')
+    print('CONFIG:')
+    print(config)
 
     # import areas
     # import province polygon
-    polygon = utils.import_areas(level=VARS['LEVEL'])
-    polygon = polygon[polygon['name'] == VARS['AREA']]
+    polygon = utils.import_areas(config, level=config.level)
+    polygon = polygon[polygon['name'] == config.area]
     assert len(polygon) == 1
 
-    # start analysis
+    # monthly amounts per process
     all_years = []
-    for year in VARS['YEARS']:
+    for year in config.actions_years:
         print(f"\nLoad {year} flows...")
-        flows = get_flows(year=year)
-        flows['Gewicht_TN'] = flows['Gewicht_KG'] / 10**3
-        print(f"Total flows: {len(flows)}")
+        filename = get_filename(config, year=year)
+        all_years.append(get_monthly(
+            config, filename,
+            read=partial(locate_flows, config, filename, areas=polygon)
+        ))
+
+    print("\nMerge all years...")
+    flows = pd.concat(all_years)
+    flows['Gewicht_TN'] = flows['Gewicht_KG'] / 10**3
+
+    # import rladder
+    rladder, rladder_names = utils.import_rladder(config)
+    flows = pd.merge(flows, rladder,
+                     how='left',
+                     left_on=['VerwerkingsmethodeCode'],
+                     right_on=['processing_code'])
+
+    print('\nCompute production graph...')
+    return production_trends(config, flows, areas=[config.area],
+                             rladder_names=rladder_names)[config.area]
 
-        # add areas to roles
-        source = ROLES['Ontvangst']['source']  # source role
-        flows = utils.add_areas(flows, role=source, areas=polygon, admin_level=LEVEL)
 
-        all_years.append(flows)
+def run_areas(config, areas=None):
+    """
+    Production trends for all areas of the config level at once
+    from the national dataset
+    areas: names of areas to compute (default: all)
+    returns {area: trends}
+    """
+    source = var.ROLES['Ontvangst']['source']
+    on = f'{source}_{config.level}'
+
+    # monthly amounts per area & process
+    path = f"{config.data_dir}/LMA/ontvangst/processed"
+    all_years = []
+    for year in config.actions_years:
+        print(f"\nLoad {year} national flows...")
+        all_years.append(get_monthly(
+            config, f"{path}/ontvangst_{year}_full.csv",
+            read=partial(utils.get_national_production, config,
+                         level=config.level, year=year, role=source)
+        ))
+        # only the analysis year is used by the other waste analyses
+        if year != config.year:
+            utils.release_production(config, level=config.level, year=year, role=source)
 
     print("\nMerge all years...")
     flows = pd.concat(all_years)
-    print(f"Total flows: {len(flows)}\n")
+    if areas is not None:
+        flows = flows[flows[on].isin(areas)]
+    flows['Gewicht_TN'] = flows['Gewicht_KG'] / 10**3
 
     # import rladder
-    print("Import rladder...")
-    path = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/descriptions/rhierarchy.xlsx"
-    rladder = pd.read_excel(path)
-    rladder = rladder[['processing_code', 'benchmark_group']]
-    rladder_names = {
-        r['benchmark_group'][0]: r['benchmark_group'][1:].strip()
-        for idx, r in rladder.iterrows()
-    }
-    rladder['benchmark_group'] = rladder['benchmark_group'].str[0]
+    rladder, rladder_names = utils.import_rladder(config)
     flows = pd.merge(flows, rladder,
                      how='left',
                      left_on=['VerwerkingsmethodeCode'],
                      right_on=['processing_code'])
 
-    # TRENDS (All amounts in tonnes) -> ONLY PRODUCTION
-    on = f'Herkomst_{LEVEL}'
-
-    # production graph (amount per quarter & regression)
-    print('\nCompute production graph...')
-    for code, name in rladder_names.items():
-        compute_trends(flows,
-                       on=[on, 'benchmark_group'],
-                       values=[[AREA], [code]],
-                       per_months=12,
-                       datatype='production_graph',
-                       prop=code,)
-
-    compute_trends(flows,
-                   on=[on],
-                   values=[[AREA]],
-                   per_months=12,
-                   datatype='production_graph',
-                   prop='total')
-
-    return DATA
\ No newline at end of file
+    print('\nCompute production graphs...')
+    return production_trends(config, flows, rladder_names=rladder_names)
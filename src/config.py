@@ -0,0 +1,136 @@
+import copy
+from dataclasses import dataclass, replace
+import variables as var
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Settings of an analysis run (area, years & folders),
+    create with Config.from_variables() for the defaults of variables.py
+    """
+    area: str
+    level: str
+    year: int
+    input_dir: str
+    output_dir: str
+    cache_dir: str
+    corops: tuple = ()
+    dmi_years: tuple = ()
+    goals_years: tuple = ()
+    actions_years: tuple = ()
+    quarter: int = 4
+    proj_end: int = 2030
+    household_kg: float = None
+    exclude_household: bool = True
+    export_excel: bool = False
+    stage_cache_gb: float = 2
+    json_decimals: int = None
+
+    @classmethod
+    def from_variables(cls, **overrides):
+        """
+        settings of variables.py, overridden by keyword
+        """
+        settings = dict(
+            area=var.AREA,
+            level=var.LEVEL,
+            year=var.YEAR,
+            input_dir=var.INPUT_DIR,
+            output_dir=var.OUTPUT_DIR,
+            cache_dir=var.CACHE_DIR,
+            corops=tuple(var.COROPS),
+            dmi_years=tuple(var.DMI_YEARS),
+            goals_years=tuple(var.GOALS_YEARS),
+            actions_years=tuple(var.ACTIONS_YEARS),
+            quarter=var.QUARTER,
+            proj_end=var.PROJ_END,
+            household_kg=var.HOUSEHOLD_KG,
+            exclude_household=var.EXCLUDE_HOUSEHOLD,
+            export_excel=var.EXPORT_EXCEL,
+            stage_cache_gb=var.STAGE_CACHE_GB,
+            json_decimals=var.JSON_DECIMALS,
+        )
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        # HOUSEHOLD_KG is the household waste of AREA only,
+        # other areas use their CBS household data unless given
+        if (settings['area'], settings['level']) != (var.AREA, var.LEVEL) \
+                and overrides.get('household_kg') is None:
+            settings['household_kg'] = None
+        for name in ['corops', 'dmi_years', 'goals_years', 'actions_years']:
+            settings[name] = tuple(settings[name])
+        return cls(**settings)
+
+    def replace(self, **changes):
+        """
+        copy with changed settings
+        """
+        return replace(self, **changes)
+
+    @property
+    def data_dir(self):
+        return f"{self.input_dir}/Database_LockedFiles/DATA"
+
+    @property
+    def monitor_dir(self):
+        return f"{self.data_dir}/monitor_data/data"
+
+    @property
+    def area_dir(self):
+        return f"{self.input_dir}/Monitors/{self.level}{self.area}"
+
+    @property
+    def corop_file(self):
+        return var.COROP_FILES[self.level]
+
+    @property
+    def postcodes(self):
+        return f'postcodes_per_gemeenten_{self.year}'
+
+    @property
+    def units(self):
+        """
+        units per page section (variables.UNITS),
+        area totals in Mt for provinces & kt for municipalities
+        """
+        unit = 'Mt' if self.level == 'Provincie' else 'kt'
+        units = copy.deepcopy(var.UNITS)
+        units['OVERVIEW']['OVERVIEW_SANKEY'] = unit
+        units['MATERIALS']['TRANSITION_AGENDAS'] = unit
+        return units
+
+
+def add_arguments(parser):
+    """
+    command line options overriding variables.py
+    """
+    parser.add_argument('--area', help=f'area in study (default: {var.AREA})')
+    parser.add_argument('--level', choices=['Gemeente', 'Provincie'],
+                        help=f'administrative level of the area (default: {var.LEVEL})')
+    parser.add_argument('--year', type=int, help=f'main year of analysis (default: {var.YEAR})')
+    parser.add_argument('--corops', nargs='+', metavar='COROP',
+                        help='COROP regions related to the area')
+    parser.add_argument('--input-dir', help='data folder')
+    parser.add_argument('--output-dir', help='folder to export data')
+    parser.add_argument('--cache-dir', help='folder for local caches')
+    parser.add_argument('--household-kg', type=float,
+                        help='household waste of the area in kg '
+                             '(default: HOUSEHOLD_KG for the default area, '
+                             'otherwise from CBS household data)')
+    return parser
+
+
+def from_arguments(args):
+    """
+    config of parsed command line options
+    """
+    return Config.from_variables(
+        area=args.area,
+        level=args.level,
+        year=args.year,
+        corops=args.corops,
+        input_dir=args.input_dir,
+        output_dir=args.output_dir,
+        cache_dir=args.cache_dir,
+        household_kg=args.household_kg,
+    )
@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
-import variables as var
+import hashlib
+import os
+from functools import lru_cache
+from src.analysis import utils, stage_cache
+from src.config import Config
 
 
 FE_GROUPS = [
@@ -62,8 +66,16 @@ IS_FE = {
     },
 }
 
+# fossil percentage per SPLIT_FE good & usage
+FE_PERC = pd.Series(
+    [IS_FE[good].get(usage, 0) for good in SPLIT_FE for usage in GEBRUIK],
+    index=pd.MultiIndex.from_product(
+        [SPLIT_FE, GEBRUIK],
+        names=['Goederengroep_naam', 'Gebruiksgroep_naam']
+    )
+)
+
 
-DATA = {}
 RELEVANT_COLS = [
     'Regionaam',
     'Stroom',
@@ -75,8 +87,7 @@ RELEVANT_COLS = [
 PROJ_START = 2015
 PROJ_END = 2030
 
-RESOURCE_TYPE = None
-FILEPATH = None
+RME_MATRICES_FILE = 'geoFluxus/CBS_to_RME.xlsx'
 
 
 def split_fossil(df, is_fossil=False):
@@ -84,20 +95,15 @@ def split_fossil(df, is_fossil=False):
     For SPLIT_FE goods, apply fossil fraction perc to fossil run, and (100-perc) to non-fossil run.
     If usage not in IS_FE[good], default perc=0 => 0% fossil, 100% non-fossil.
     """
-    for good in SPLIT_FE:
-        for usage in GEBRUIK:
-            condition = (
-                (df['Goederengroep_naam'] == good) &
-                (df['Gebruiksgroep_naam'] == usage)
-            )
-            perc = IS_FE[good].get(usage, 0)
-            factor = (perc if is_fossil else 100 - perc) / 100
-            for value in ['Brutogew', 'Waarde']:
-                df.loc[condition, value] = df.loc[condition, value] * factor
+    perc = FE_PERC if is_fossil else 100 - FE_PERC
+    keys = pd.MultiIndex.from_frame(df[FE_PERC.index.names])
+    factor = (perc / 100).reindex(keys).fillna(1).to_numpy()
+    for value in ['Brutogew', 'Waarde']:
+        df[value] = df[value] * factor
     return df
 
 
-def compute_local_extraction(data, value=None, lokale_winning_groups=None):
+def compute_local_extraction(data, value=None, lokale_winning_groups=None, resource_type=None):
     data = pd.pivot_table(
         data,
         values=value,
@@ -133,7 +139,7 @@ def compute_local_extraction(data, value=None, lokale_winning_groups=None):
 
     # resource types
     data = data.merge(
-        RESOURCE_TYPE.drop_duplicates(["Goederengroep"]),
+        resource_type.drop_duplicates(["Goederengroep"]),
         on="Goederengroep",
         how="left",
         validate="m:1"
@@ -142,29 +148,107 @@ def compute_local_extraction(data, value=None, lokale_winning_groups=None):
     return data
 
 
-def calculate_rmi_rmc(df, eur_df, year, save=False, abiotisch=False):
-    cols_import = ['Winning', 'Invoer_nationaal', 'Invoer_internationaal']
-    cols_export = ['Uitvoer_nationaal', 'Uitvoer_internationaal']
-    rme_matrices_file = 'geoFluxus/CBS_to_RME.xlsx'
+def convert_to_rme(rm_data, converter, flows):
+    """
+    Raw material equivalents of flows per region & year:
+    sum over goods of (good -> raw material factor) x (flow of good),
+    computed for all regions, years & raw materials in one product
+    """
+    groups = rm_data.groupby(['Regionaam', 'Jaar'])
+    keys = groups.size().index
+    codes = groups.ngroup().to_numpy()
+    rows = np.flatnonzero(codes >= 0)
+    in_group = np.zeros((len(rm_data), len(keys)))
+    in_group[rows, codes[rows]] = 1
+
+    factors = converter.reindex(rm_data['Goederengroep']).fillna(0).to_numpy(dtype=float)
+    amounts = rm_data[flows].fillna(0).to_numpy(dtype=float)
+    rme = np.einsum('rg,rm,rf->gmf', in_group, factors, amounts, optimize=True)
+
+    index = pd.MultiIndex.from_tuples(
+        [(*key, material) for key in keys for material in converter.columns],
+        names=[*keys.names, None]
+    )
+    return pd.DataFrame(rme.reshape(-1, len(flows)), index=index, columns=flows)
+
 
-    cbs_rme = pd.read_excel(f'{FILEPATH}/{rme_matrices_file}', sheet_name='CBS_to_RME_codes').fillna(0)
-    eur_or_t = pd.read_excel(f'{FILEPATH}/{rme_matrices_file}', sheet_name='eur_or_t')
-    eur_or_t.set_index(eur_or_t['CBS_name'])
+def load_rme_matrices(config):
+    """
+    Parse CBS_to_RME workbook once (all sheets in a single read)
+    into eur_or_t, abiotic materials & CBS -> RME converters per year,
+    kept in memory & persisted under the cache folder by workbook hash
+    (shared between callers, do not modify)
+    """
+    path = f'{config.monitor_dir}/{RME_MATRICES_FILE}'
+    return read_rme_matrices(os.path.abspath(path), utils.file_stamp(path), config.cache_dir)
 
-    rme_import_coefficients = pd.read_excel(f'{FILEPATH}/{rme_matrices_file}', sheet_name='RME_import_' + str(year))
-    rme_export_coefficients = pd.read_excel(f'{FILEPATH}/{rme_matrices_file}', sheet_name='RME_export_' + str(year))
-    rm_groups_import = rme_import_coefficients['Raw_material_name'][1:]
-    rm_groups_export = rme_export_coefficients['Raw_material_name'][1:]
 
-    convert_import = cbs_rme.values[1:, 1:].astype(float) @ rme_import_coefficients.values[1:, 2:].T
-    converter_import = pd.DataFrame(index=cbs_rme['CBS_name'][1:], columns=rm_groups_import, data=convert_import)
+@lru_cache(maxsize=None)
+def read_rme_matrices(path, stamp, cache_dir):
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cached = f'{cache_dir}/rme/CBS_to_RME_{digest[:12]}.pkl'
+    if os.path.exists(cached):
+        matrices = pd.read_pickle(cached)
+    else:
+        print('Parse CBS to RME matrices...')
+        sheets = pd.read_excel(path, sheet_name=None)
+        cbs_rme = sheets['CBS_to_RME_codes'].fillna(0)
+
+        matrices = {
+            'eur_or_t': sheets['eur_or_t'],
+            'abiotisch': sheets['abiotisch'],
+            'import': {},
+            'export': {}
+        }
+        for name, coefficients in sheets.items():
+            typ, _, year = name.removeprefix('RME_').partition('_')
+            if not name.startswith('RME_') or typ not in ['import', 'export'] or not year.isdigit():
+                continue
+            rm_groups = coefficients['Raw_material_name'][1:]
+            convert = cbs_rme.values[1:, 1:].astype(float) @ coefficients.values[1:, 2:].T
+            matrices[typ][int(year)] = pd.DataFrame(index=cbs_rme['CBS_name'][1:], columns=rm_groups, data=convert)
+
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        pd.to_pickle(matrices, f'{cached}.{os.getpid()}')
+        os.replace(f'{cached}.{os.getpid()}', cached)
+
+    return matrices
+
+
+def rme_files(config):
+    """
+    workbook read by convert_rmi_rmc
+    """
+    return [f'{config.monitor_dir}/{RME_MATRICES_FILE}']
 
-    convert_export = cbs_rme.values[1:, 1:].astype(float) @ rme_export_coefficients.values[1:, 2:].T
-    converter_export = pd.DataFrame(index=cbs_rme['CBS_name'][1:], columns=rm_groups_export, data=convert_export)
 
-    if save:
-        converter_import.to_excel(FILEPATH + f'cbs_to_rme_conversion_table_import_{year}.xlsx')
-        converter_export.to_excel(FILEPATH + f'cbs_to_rme_conversion_table_export_{year}.xlsx')
+def calculate_rmi_rmc(df, eur_df, year, config=None, exported=None, abiotisch=False):
+    # conversion tables are exported once per year
+    # exported: years with exported tables (no export if None)
+    if exported is not None and year not in exported:
+        matrices = load_rme_matrices(config)
+        for typ in ['import', 'export']:
+            matrices[typ][year].to_excel(
+                f'{config.monitor_dir}/cbs_to_rme_conversion_table_{typ}_{year}.xlsx'
+            )
+        exported.add(year)
+
+    return convert_rmi_rmc(df, eur_df, year, config=config, abiotisch=abiotisch)
+
+
+@stage_cache.memoize(files=rme_files)
+def convert_rmi_rmc(df, eur_df, year, config=None, abiotisch=False):
+    """
+    RMI & RMC per raw material of goods data for a year
+    """
+    cols_import = ['Winning', 'Invoer_nationaal', 'Invoer_internationaal']
+    cols_export = ['Uitvoer_nationaal', 'Uitvoer_internationaal']
+
+    matrices = load_rme_matrices(config)
+    eur_or_t = matrices['eur_or_t']
+    converter_import = matrices['import'][year]
+    converter_export = matrices['export'][year]
 
     rm_data = pd.DataFrame()
 
@@ -185,43 +269,15 @@ def calculate_rmi_rmc(df, eur_df, year, save=False, abiotisch=False):
     df.reset_index(inplace=True)
     eur_df.reset_index(inplace=True)
 
-    df_import = pd.merge(rm_data, converter_import, left_on='Goederengroep', right_index=True, how='left').fillna(0)
-
-    out_cols = []
-    for i in rm_groups_import:
-        for j in cols_import:
-            out_cols.append((i, j))
-    df_import = pd.concat([df_import, pd.DataFrame(0, columns=out_cols, index=df_import.index)], axis=1)
-
-    for i in rm_groups_import:
-        for j in cols_import:
-            df_import[i, j] += df_import[i] * df_import[j]
-
-    materials = df_import.groupby(['Regionaam', 'Jaar'])[out_cols].sum()
-    materials.columns = pd.MultiIndex.from_tuples(out_cols)
-    materials = materials.stack(level=0, future_stack=True)
+    materials = convert_to_rme(rm_data, converter_import, cols_import)
 
     if abiotisch:
-        abiotics = pd.read_excel(f'{FILEPATH}/{rme_matrices_file}', sheet_name='abiotisch')
+        abiotics = matrices['abiotisch']
         materials = materials[materials.index.get_level_values(2).isin(abiotics['Abiotisch'])]
 
     materials['RMI'] = materials['Winning'] + materials['Invoer_internationaal'] + materials['Invoer_nationaal']
 
-    df_export = pd.merge(rm_data, converter_export, left_on='Goederengroep', right_index=True, how='left').fillna(0)
-
-    out_cols_exp = []
-    for i in rm_groups_export:
-        for j in cols_export:
-            out_cols_exp.append((i, j))
-    df_export = pd.concat([df_export, pd.DataFrame(0, columns=out_cols_exp, index=df_export.index)], axis=1)
-
-    for i in rm_groups_export:
-        for j in cols_export:
-            df_export[i, j] += df_export[i] * df_export[j]
-
-    materials_export = df_export.groupby(['Regionaam', 'Jaar'])[out_cols_exp].sum()
-    materials_export.columns = pd.MultiIndex.from_tuples(out_cols_exp)
-    materials_export = materials_export.stack(level=0, future_stack=True)
+    materials_export = convert_to_rme(rm_data, converter_export, cols_export)
 
     if abiotisch:
         materials_export = materials_export[materials_export.index.get_level_values(2).isin(abiotics['Abiotisch'])]
@@ -232,105 +288,193 @@ def calculate_rmi_rmc(df, eur_df, year, save=False, abiotisch=False):
     return materials.reset_index()
 
 
-def calculate_indicators(path, file_name, corop=var.COROPS, raw_materials=False, goal='abiotisch', is_fossil=False):
-    dmcs = pd.DataFrame()
-    dmis = pd.DataFrame()
-    all_data = pd.DataFrame()
-    all_eur_data = pd.DataFrame()
-    all_rm_data = pd.DataFrame()
+def load_cbs(config, corop=None):
+    """
+    Read CBS regional flows once for all scenarios,
+    keep years & regions in study without waste & total sums
+    corop: regions to keep (default: config.corops)
+    """
+    if corop is None:
+        corop = config.corops
+    if isinstance(corop, str):
+        corop = [corop]
 
-    df = pd.read_csv(path + file_name, low_memory=False, sep=',')
+    path = f"{config.monitor_dir}/CBS/{config.corop_file}.csv"
+    df = pd.read_csv(path, low_memory=False, sep=',')
     df = df.dropna(how='all', axis='columns')
 
-    for year in var.DMI_YEARS:
-        if isinstance(corop, str):
-            corop = [corop]
-
-        df_year = df[
-            (df['Jaar'] == year) &
-            (df['Regionaam'].isin(corop)) &
-            # (df['Goederengroep_naam'] != 'Huishoudelijk afval en gemeentelijk afval') &
-            (~df['Goederengroep_naam'].str.contains('afval', case=False, na=False)) &
-            (df['Gebruiksgroep_naam'] != 'Totaal')
-        ].copy()
-
-        fossil_groups = df_year['Goederengroep_naam'].isin(FE_GROUPS)
-        if not is_fossil:
-            fossil_groups = ~(fossil_groups)
-        else:
-            split_groups = df_year['Goederengroep_naam'].isin(SPLIT_FE)
-            fossil_groups = fossil_groups | split_groups
-        df_year = df_year[fossil_groups]
+    return df[
+        (df['Jaar'].isin(config.dmi_years)) &
+        (df['Regionaam'].isin(corop)) &
+        # (df['Goederengroep_naam'] != 'Huishoudelijk afval en gemeentelijk afval') &
+        (~df['Goederengroep_naam'].str.contains('afval', case=False, na=False)) &
+        (df['Gebruiksgroep_naam'] != 'Totaal')
+    ]
+
+
+def load_resource_type(config):
+    """
+    Resource type (& local extraction) per goods group
+    """
+    path = f"{config.monitor_dir}/geofluxus"
+    return pd.read_csv(f'{path}/cbs_biotisch_abiotisch_2024_final.csv', delimiter=';')
 
-        df_year = split_fossil(df_year, is_fossil=is_fossil)
 
-        lokale_winning_groups = RESOURCE_TYPE[RESOURCE_TYPE['Lokale winning'] == 'ja']['Goederengroep'].tolist()
+def split_year(df_year, resource_type, is_fossil=False, raw_materials=False):
+    """
+    Fossil or non-fossil part of a year,
+    pivoted to local extraction in weight (& value)
+    """
+    fossil_groups = df_year['Goederengroep_naam'].isin(FE_GROUPS)
+    if not is_fossil:
+        fossil_groups = ~(fossil_groups)
+    else:
+        split_groups = df_year['Goederengroep_naam'].isin(SPLIT_FE)
+        fossil_groups = fossil_groups | split_groups
+    df_year = df_year[fossil_groups].copy()
 
-        data = compute_local_extraction(df_year, value="Brutogew", lokale_winning_groups=lokale_winning_groups)
+    df_year = split_fossil(df_year, is_fossil=is_fossil)
 
-        if raw_materials:
-            eur_data = compute_local_extraction(df_year, value="Waarde", lokale_winning_groups=lokale_winning_groups)
+    lokale_winning_groups = resource_type[resource_type['Lokale winning'] == 'ja']['Goederengroep'].tolist()
+
+    data = compute_local_extraction(df_year, value="Brutogew",
+                                    lokale_winning_groups=lokale_winning_groups,
+                                    resource_type=resource_type)
+
+    eur_data = None
+    if raw_materials:
+        eur_data = compute_local_extraction(df_year, value="Waarde",
+                                            lokale_winning_groups=lokale_winning_groups,
+                                            resource_type=resource_type)
 
-        if 'abiotisch' in goal:
-            abiotisch = data[data['Grondstof'] == 'abiotisch']
+    return data, eur_data
 
-            abiotisch_in_gemengd = data[data['Grondstof'] == 'gemengd']
-            abiotisch_in_gemengd = abiotisch_in_gemengd.apply(lambda x: x * 0.5 if x.dtype == 'float64' else x)
 
-            all_abiotisch = pd.concat([abiotisch, abiotisch_in_gemengd])
+def aggregate_goal(data, eur_data, goal=None, raw_materials=False):
+    """
+    Aggregate year data for a goal
+    """
+    rm_data = eur_aggregated = None
 
-            aggregated = all_abiotisch.groupby(['Regionaam']).sum(numeric_only=True).reset_index()
-            if raw_materials:
-                rm_data = data.copy()
-                eur_aggregated = eur_data.copy()
+    if 'abiotisch' in goal:
+        abiotisch = data[data['Grondstof'] == 'abiotisch']
 
-        elif goal == 'agg_per_type':
-            aggregated = data.groupby(['Regionaam', 'Grondstof']).sum(numeric_only=True).reset_index()
-            if raw_materials:
-                eur_aggregated = eur_data.groupby(['Regionaam', 'Grondstof']).sum(numeric_only=True).reset_index()
+        abiotisch_in_gemengd = data[data['Grondstof'] == 'gemengd']
+        abiotisch_in_gemengd = abiotisch_in_gemengd.apply(lambda x: x * 0.5 if x.dtype == 'float64' else x)
 
-        elif goal == 'agg_per_province':
-            aggregated = data.groupby(['Regionaam']).sum(numeric_only=True).reset_index()
-            if raw_materials:
-                eur_aggregated = eur_data.groupby(['Regionaam']).sum(numeric_only=True).reset_index()
+        all_abiotisch = pd.concat([abiotisch, abiotisch_in_gemengd])
 
-        else:
-            aggregated = data.copy()
-            if raw_materials:
-                eur_aggregated = eur_data.copy()
+        aggregated = all_abiotisch.groupby(['Regionaam']).sum(numeric_only=True).reset_index()
+        if raw_materials:
+            rm_data = data.copy()
+            eur_aggregated = eur_data.copy()
 
-        aggregated['DMI'] = aggregated['Winning'] + aggregated['Invoer_nationaal'] + aggregated['Invoer_internationaal']
-        aggregated['DMC'] = aggregated['DMI'] - aggregated['Uitvoer_nationaal'] - aggregated['Uitvoer_internationaal']
-        aggregated['National_DMI'] = aggregated['Winning'] + aggregated['Invoer_internationaal']
-        aggregated['Jaar'] = year
+    elif goal == 'agg_per_type':
+        aggregated = data.groupby(['Regionaam', 'Grondstof']).sum(numeric_only=True).reset_index()
+        if raw_materials:
+            eur_aggregated = eur_data.groupby(['Regionaam', 'Grondstof']).sum(numeric_only=True).reset_index()
 
+    elif goal == 'agg_per_province':
+        aggregated = data.groupby(['Regionaam']).sum(numeric_only=True).reset_index()
         if raw_materials:
-            eur_aggregated['Jaar'] = year
+            eur_aggregated = eur_data.groupby(['Regionaam']).sum(numeric_only=True).reset_index()
 
-        if not 'abiotisch' in goal:
-            outcomes_rm = calculate_rmi_rmc(aggregated, eur_aggregated, year, save=True)
-        else:
-            rm_data['Jaar'] = year
-            outcomes_rm = calculate_rmi_rmc(rm_data, eur_aggregated, year, save=True, abiotisch=True)
+    else:
+        aggregated = data.copy()
+        if raw_materials:
+            eur_aggregated = eur_data.copy()
+
+    aggregated['DMI'] = aggregated['Winning'] + aggregated['Invoer_nationaal'] + aggregated['Invoer_internationaal']
+    aggregated['DMC'] = aggregated['DMI'] - aggregated['Uitvoer_nationaal'] - aggregated['Uitvoer_internationaal']
+    aggregated['National_DMI'] = aggregated['Winning'] + aggregated['Invoer_internationaal']
 
-        dmc = aggregated[['Regionaam', 'DMC', 'Jaar']].copy(deep=True)
-        dmi = aggregated[['Regionaam', 'DMI', 'Jaar']].copy(deep=True)
+    return aggregated, eur_aggregated, rm_data
 
-        dmcs = pd.concat([dmcs, dmc], ignore_index=True)
-        dmis = pd.concat([dmis, dmi], ignore_index=True)
+
+def calculate_scenarios(df, scenarios, config, raw_materials=False):
+    """
+    Indicators for several (goal, is_fossil) scenarios in one pass:
+    year partitions, fossil splits & local extraction pivots
+    are computed once & shared between scenarios,
+    as are RME conversions of the same goods data
+    (abiotic scenarios filter the total conversion)
+    config: analysis settings (years, monitor data & cache folders)
+    """
+    resource_type = load_resource_type(config)
+    exported = set()  # years of exported RME conversion tables
+    outputs = {
+        scenario: {
+            'dmcs': [], 'dmis': [], 'all_data': [],
+            'all_eur_data': [], 'all_rm_data': []
+        } for scenario in scenarios
+    }
+
+    years = dict(list(df.groupby('Jaar')))
+    for year in config.dmi_years:
+        df_year = years.get(year, df.iloc[:0])
+
+        for is_fossil in dict.fromkeys(fossil for goal, fossil in scenarios):
+            data, eur_data = split_year(df_year, resource_type,
+                                        is_fossil=is_fossil, raw_materials=raw_materials)
+
+            rm_goods = None  # RME of goods data, shared by total & abiotic
+            for goal, fossil in scenarios:
+                if fossil != is_fossil:
+                    continue
+                output = outputs[(goal, fossil)]
+
+                aggregated, eur_aggregated, rm_data = aggregate_goal(
+                    data, eur_data, goal=goal, raw_materials=raw_materials
+                )
+                aggregated['Jaar'] = year
+
+                if raw_materials:
+                    eur_aggregated['Jaar'] = year
+
+                    # per goods data, RME is the same for total & abiotic
+                    if goal == 'total' or 'abiotisch' in goal:
+                        if rm_goods is None:
+                            rm_data = aggregated if rm_data is None else rm_data
+                            rm_data['Jaar'] = year
+                            rm_goods = calculate_rmi_rmc(rm_data, eur_aggregated, year,
+                                                         config=config, exported=exported)
+                        outcomes_rm = rm_goods
+                        if 'abiotisch' in goal:
+                            abiotics = load_rme_matrices(config)['abiotisch']['Abiotisch']
+                            outcomes_rm = rm_goods[rm_goods['level_2'].isin(abiotics)].reset_index(drop=True)
+                    else:
+                        outcomes_rm = calculate_rmi_rmc(aggregated, eur_aggregated, year,
+                                                        config=config, exported=exported)
+
+                    output['all_rm_data'].append(outcomes_rm)
+                    output['all_eur_data'].append(eur_aggregated)
+
+                output['dmcs'].append(aggregated[['Regionaam', 'DMC', 'Jaar']].copy(deep=True))
+                output['dmis'].append(aggregated[['Regionaam', 'DMI', 'Jaar']].copy(deep=True))
+                output['all_data'].append(aggregated)
+
+    results = {}
+    for scenario, output in outputs.items():
+        dmcs = pd.concat(output['dmcs'], ignore_index=True)
+        dmis = pd.concat(output['dmis'], ignore_index=True)
+        all_data = pd.concat(output['all_data'], ignore_index=True)
 
         if raw_materials:
-            all_rm_data = pd.concat([all_rm_data, outcomes_rm], ignore_index=True)
-            all_eur_data = pd.concat([all_eur_data, eur_aggregated], ignore_index=True)
+            all_rm_data = pd.concat(output['all_rm_data'], ignore_index=True)
+            all_eur_data = pd.concat(output['all_eur_data'], ignore_index=True)
+            rmcs = all_rm_data[['Regionaam', 'RMC', 'Jaar']].copy()
+            rmis = all_rm_data[['Regionaam', 'RMI', 'Jaar']].copy()
+            results[scenario] = dmcs, dmis, rmcs, rmis, all_data, all_eur_data, all_rm_data
+        else:
+            results[scenario] = dmcs, dmis
 
-        all_data = pd.concat([all_data, aggregated], ignore_index=True)
+    return results
 
-    if raw_materials:
-        rmcs = all_rm_data[['Regionaam', 'RMC', 'Jaar']].copy()
-        rmis = all_rm_data[['Regionaam', 'RMI', 'Jaar']].copy()
-        return dmcs, dmis, rmcs, rmis, all_data, all_eur_data, all_rm_data
-    else:
-        return dmcs, dmis
+
+def calculate_indicators(config, corop=None, raw_materials=False, goal='abiotisch', is_fossil=False):
+    df = load_cbs(config, corop=corop)
+    scenario = (goal, is_fossil)
+    return calculate_scenarios(df, [scenario], config, raw_materials=raw_materials)[scenario]
 
 
 def _aggregate_no_gebruik(df: pd.DataFrame) -> pd.DataFrame:
@@ -363,7 +507,7 @@ def _aggregate_no_gebruik(df: pd.DataFrame) -> pd.DataFrame:
     return df.groupby(key_cols, as_index=False)[num_cols].sum()
 
 
-def _write_three_sheets(excel_path: str, non_fe: pd.DataFrame, fe: pd.DataFrame):
+def _write_three_sheets(config, name: str, non_fe: pd.DataFrame, fe: pd.DataFrame):
     """
     Write NON_FE, FE, and ALL.
     ALL = NON_FE + FE, then aggregate away Gebruiksgroep_naam.
@@ -371,50 +515,33 @@ def _write_three_sheets(excel_path: str, non_fe: pd.DataFrame, fe: pd.DataFrame)
     all_df = pd.concat([non_fe, fe], ignore_index=True)
     all_df = _aggregate_no_gebruik(all_df)
 
-    with pd.ExcelWriter(excel_path, engine="openpyxl", mode="w") as writer:
-        non_fe.to_excel(writer, sheet_name="NON_FE", index=False)
-        fe.to_excel(writer, sheet_name="FE", index=False)
-        all_df.to_excel(writer, sheet_name="ALL", index=False)
+    utils.write_sheets(config, name, {
+        "NON_FE": non_fe,
+        "FE": fe,
+        "ALL": all_df
+    })
 
 
-def run():
-    global FILEPATH, RESOURCE_TYPE
-
+def run(config):
     print("\nDMI-RMI")
-    FILEPATH = f"{var.INPUT_DIR}/Database_LockedFiles/DATA/monitor_data/data"
-
-    filename = f"/CBS/{var.COROP_FILE}.csv"
-
-    path = f"{FILEPATH}/geofluxus"
-    RESOURCE_TYPE = pd.read_csv(f'{path}/cbs_biotisch_abiotisch_2024_final.csv', delimiter=';')
-
-    # --- NON_FE ---
-    dmcs_non, dmis_non, rmcs_non, rmis_non, all_data_non, all_eur_non, all_rm_non = calculate_indicators(
-        FILEPATH, filename,
-        raw_materials=True,
-        goal='total',
-        is_fossil=False
-    )
 
-    # --- FE ---
-    dmcs_fe, dmis_fe, rmcs_fe, rmis_fe, all_data_fe, all_eur_fe, all_rm_fe = calculate_indicators(
-        FILEPATH, filename,
-        raw_materials=True,
-        goal='total',
-        is_fossil=True
+    # NON_FE & FE totals, NON_FE abiotic in one pass
+    scenarios = calculate_scenarios(
+        load_cbs(config),
+        [('total', False), ('total', True), ('abiotisch', False)],
+        config,
+        raw_materials=True
     )
+    dmcs_non, dmis_non, rmcs_non, rmis_non, all_data_non, all_eur_non, all_rm_non = scenarios[('total', False)]
+    dmcs_fe, dmis_fe, rmcs_fe, rmis_fe, all_data_fe, all_eur_fe, all_rm_fe = scenarios[('total', True)]
 
-    # Export 3 workbooks with NON_FE / FE / ALL
-    _write_three_sheets(f"{var.OUTPUT_DIR}/all_raw_material_data.xlsx", all_rm_non, all_rm_fe)
-    _write_three_sheets(f"{var.OUTPUT_DIR}/all_data.xlsx", all_data_non, all_data_fe)
-    _write_three_sheets(f"{var.OUTPUT_DIR}/euro_data_all.xlsx", all_eur_non, all_eur_fe)
+    # Export 3 tables with NON_FE / FE / ALL
+    _write_three_sheets(config, "all_raw_material_data", all_rm_non, all_rm_fe)
+    _write_three_sheets(config, "all_data", all_data_non, all_data_fe)
+    _write_three_sheets(config, "euro_data_all", all_eur_non, all_eur_fe)
 
     # Keep your original “dmi_dmc.xlsx” export (NON_FE only by default)
-    dmcs_ab_non, dmis_ab_non, rmcs_ab_non, rmis_ab_non, _, _, _ = calculate_indicators(
-        FILEPATH, filename,
-        raw_materials=True,
-        is_fossil=False
-    )
+    dmcs_ab_non, dmis_ab_non, rmcs_ab_non, rmis_ab_non, _, _, _ = scenarios[('abiotisch', False)]
 
     sheets = {
         'dmc': dmcs_non,
@@ -427,10 +554,12 @@ def run():
         'rmi_ab': rmis_ab_non,
     }
 
-    with pd.ExcelWriter(f"{var.OUTPUT_DIR}/dmi_dmc.xlsx", engine="openpyxl") as writer:
-        for indicator, data in sheets.items():
-            data.to_excel(writer, sheet_name=indicator[:31], index=False)
+    utils.write_sheets(config, "dmi_dmc", sheets)
+
+
+def main(config=None):
+    run(config or Config.from_variables())
 
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,4 +1,6 @@
 import pandas as pd
+from src.analysis import utils
+from src.config import Config
 
 
 def pivot_and_write(data, writer, group=None, indicators=[]):
@@ -32,12 +34,14 @@ def pivot_and_write(data, writer, group=None, indicators=[]):
         df_pivot.to_excel(writer, sheet_name=indicator, index=False)
 
 
-if __name__ == '__main__':
+def main(config=None):
+    config = config or Config.from_variables()
+
     # ALWAYS overwrite the file cleanly
-    with pd.ExcelWriter('json/general_overview.xlsx', engine='openpyxl', mode='w') as writer:
+    with pd.ExcelWriter(f'{config.output_dir}/general_overview.xlsx', engine='openpyxl', mode='w') as writer:
 
         # 1. Impact data
-        impact = pd.read_excel('json/all_impact_data.xlsx')
+        impact = utils.read_sheet(config, 'all_impact_data', 'data')
         pivot_and_write(
             impact, writer,
             group='Goederengroep',
@@ -45,7 +49,7 @@ if __name__ == '__main__':
         )
 
         # 2. Raw material data
-        raw = pd.read_excel('json/all_raw_material_data.xlsx')
+        raw = utils.read_sheet(config, 'all_raw_material_data', 'NON_FE')
         pivot_and_write(
             raw, writer,
             group='level_2',
@@ -58,11 +62,15 @@ if __name__ == '__main__':
             indicators=['CO2 emissions total (kt)', 'MKI total (mln euro)']
         )
 
-        materials = pd.read_excel('json/material_contents.xlsx')
+        materials = utils.read_sheet(config, 'material_contents', 'data')
         materials.to_excel(writer, sheet_name='Leveringszekerheid', index=False)
 
-        potential = pd.read_excel('json/benchmark.xlsx')
+        potential = utils.read_sheet(config, 'benchmark', 'data')
         potential['eural code'] = potential['eural code'].astype(str).str.zfill(6)
         potential.to_excel(writer, sheet_name='Afval', index=False)
 
-    print("Finished writing general_overview.xlsx")
\ No newline at end of file
+    print("Finished writing general_overview.xlsx")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,16 @@
-import variables as var
-import json
 from src.analysis import environmental_cost
+from src import serializer
+from src.config import Config
 
 
-DATA = {}
+def main(config=None):
+    config = config or Config.from_variables()
 
-if __name__ == '__main__':
-    DATA = environmental_cost.run()
+    DATA = environmental_cost.run(config)
+
+    serializer.dump(DATA, f"{config.output_dir}/impact.json",
+                    decimals=config.json_decimals)
 
-    with open(f"{var.OUTPUT_DIR}/impact.json", 'w') as outfile:
-        from src import _make_iterencode
-        json.encoder._make_iterencode = _make_iterencode._make_iterencode
-        indent = (2, None)
-        json.dump(DATA, outfile, indent=indent)
\ No newline at end of file
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,19 @@
-import variables as var
-import json
 from src.analysis import (material_agendas_sankey,
                           overview_sankey,
                           overview_usage)
+from src import serializer
+from src.config import Config
 
 
-DATA = {}
+def main(config=None):
+    config = config or Config.from_variables()
 
-if __name__ == '__main__':
-    # waste trends (production & processing)
-    DATA["overview_sankey"] = overview_sankey.run()
-    DATA["overview_usage"] = overview_usage.run()
+    DATA = {}
+    DATA["overview_sankey"] = overview_sankey.run(config)
+    DATA["overview_usage"] = overview_usage.run(config)
     DATA = dict({
         **DATA,
-        **material_agendas_sankey.run()
+        **material_agendas_sankey.run(config)
     })
     highlights = DATA['highlights'] = {}
 
@@ -44,8 +44,9 @@ if __name__ == '__main__':
         'name': max_waste.replace("_", " ").capitalize()
     }
 
-    with open(f"{var.OUTPUT_DIR}/materials.json", 'w') as outfile:
-        from src import _make_iterencode
-        json.encoder._make_iterencode = _make_iterencode._make_iterencode
-        indent = (2, None)
-        json.dump(DATA, outfile, indent=indent)
+    serializer.dump(DATA, f"{config.output_dir}/materials.json",
+                    decimals=config.json_decimals)
+
+
+if __name__ == '__main__':
+    main()
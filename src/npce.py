@@ -1,16 +1,11 @@
-import json
 import pandas as pd
 import variables as var
 from src.analysis import utils
+from src import serializer
+from src.config import Config
 
 
 BEGIN = 2016
-HUIDIG = var.YEAR
-YEARS = range(BEGIN, HUIDIG + 1)
-
-DATA = {
-    'indicators': {}
-}
 
 
 def format_num(num):
@@ -28,11 +23,11 @@ def renewable_sum(df):
     )
 
 
-def vervangen(df):
+def vervangen(df, huidig):
     begin_sum = renewable_sum(df[df['Jaar'] == BEGIN])
     begin_total_sum = df[df['Jaar'] == BEGIN]['DMI'].sum()
-    huidig_sum = renewable_sum(df[df['Jaar'] == HUIDIG])
-    huidig_total_sum = df[df['Jaar'] == HUIDIG]['DMI'].sum()
+    huidig_sum = renewable_sum(df[df['Jaar'] == huidig])
+    huidig_total_sum = df[df['Jaar'] == huidig]['DMI'].sum()
     indicator = {
         'begin': {
             'renew': perc(begin_sum, begin_total_sum),
@@ -48,7 +43,7 @@ def vervangen(df):
     graph = {
         'data': []
     }
-    for year in YEARS:
+    for year in range(BEGIN, huidig + 1):
         cats, year_df = utils.split_categories(
             df[df['Jaar'] == year],
             column='productgroepen',
@@ -71,12 +66,12 @@ def vervangen(df):
     return indicator, graph
 
 
-def besparen(df):
+def besparen(df, huidig):
     g2030 = 6
     g2035 = 15
     begin_sum = df[df['Jaar'] == BEGIN]['DMI'].sum()
     begin_total_sum = df[df['Jaar'] == BEGIN]['DMI'].sum()
-    huidig_sum = df[df['Jaar'] == HUIDIG]['DMI'].sum()
+    huidig_sum = df[df['Jaar'] == huidig]['DMI'].sum()
 
     indicator = {
         'begin': {
@@ -113,7 +108,7 @@ def besparen(df):
             {'value': format_num(begin_total_sum * (100 - g2035) / 100)},
         ]
     }
-    for year in YEARS:
+    for year in range(BEGIN, huidig + 1):
         cats, year_df = utils.split_categories(
             df[df['Jaar'] == year],
             column='productgroepen',
@@ -133,18 +128,17 @@ def besparen(df):
     return indicator, graph
 
 
-def compute_goederen():
+def compute_goederen(config, data):
     # add NON_FE (non-fossil) data
-    path = fr"{var.OUTPUT_DIR}/all_data.xlsx"
-    df = pd.read_excel(path, sheet_name='NON_FE')
+    df = utils.read_sheet(config, 'all_data', 'NON_FE')
 
     # merge with renewable
-    path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_hernieuwbaar.xlsx"
+    path = f"{config.data_dir}/ontology/npce_hernieuwbaar.xlsx"
     renewable = pd.read_excel(path)
     goederen = pd.merge(df, renewable, on='cbs')
 
     # merge with product groups
-    path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_productgroepen.xlsx"
+    path = f"{config.data_dir}/ontology/npce_productgroepen.xlsx"
     productgroups = pd.read_excel(path, sheet_name='goederen')
     goederen = pd.merge(goederen, productgroups, on='cbs')
 
@@ -153,31 +147,9 @@ def compute_goederen():
         ('vervangen', vervangen),
         ('besparen', besparen)
     ]:
-        indicator, graph = func(goederen)
-        DATA['indicators'][goal] = indicator
-        DATA[goal] = graph
-
-
-def filter_by_area(df):
-    ROLES = var.ROLES
-
-    # import areas
-    # import province polygon
-    polygon = utils.import_areas(level=var.LEVEL)
-    polygon = polygon[polygon['name'] == var.AREA]
-    assert len(polygon) == 1
-
-    # add areas to roles
-    source = ROLES['Ontvangst']['source']  # source role
-    df = utils.add_areas(
-        df,
-        role=source,
-        areas=polygon,
-        admin_level=var.LEVEL
-    )
-
-    # ONLY PRODUCTION
-    return df[df[f"{source}_{var.LEVEL}"] == var.AREA]
+        indicator, graph = func(goederen, config.year)
+        data['indicators'][goal] = indicator
+        data[goal] = graph
 
 
 def get_process_sum(df, process=None):
@@ -186,12 +158,12 @@ def get_process_sum(df, process=None):
     ]['Gewicht_kt'].sum()
 
 
-def behouden_hoeveelheid(df):
+def behouden_hoeveelheid(df, huidig):
     g2030 = 15
     g2035 = 15
     begin_sum = df[df['MeldPeriodeJAAR'] == BEGIN]['Gewicht_kt'].sum()
     begin_total_sum = df[df['MeldPeriodeJAAR'] == BEGIN]['Gewicht_kt'].sum()
-    huidig_sum = df[df['MeldPeriodeJAAR'] == HUIDIG]['Gewicht_kt'].sum()
+    huidig_sum = df[df['MeldPeriodeJAAR'] == huidig]['Gewicht_kt'].sum()
 
     indicator = {
         'begin': {
@@ -225,7 +197,7 @@ def behouden_hoeveelheid(df):
         'unit': 'kt',
     }
 
-    for year in YEARS:
+    for year in range(BEGIN, huidig + 1):
         cats, year_df = utils.split_categories(
             df[df['MeldPeriodeJAAR'] == year],
             column='productgroepen',
@@ -248,10 +220,10 @@ def behouden_hoeveelheid(df):
     return indicator, graph
 
 
-def behouden_verwerking(df):
+def behouden_verwerking(df, huidig):
     begin = df[df['MeldPeriodeJAAR'] == BEGIN]
     begin_total_sum = begin['Gewicht_kt'].sum()
-    huidig = df[df['MeldPeriodeJAAR'] == HUIDIG]
+    huidig = df[df['MeldPeriodeJAAR'] == huidig]
     huidig_total_sum = huidig['Gewicht_kt'].sum()
 
     indicator = {
@@ -299,28 +271,31 @@ def behouden_verwerking(df):
     return indicator, graph
 
 
-def compute_afval():
+def compute_afval(config, data):
     # import lma datasets (production only)
     concats = []
-    path = fr"{var.INPUT_DIR}\Monitors\{var.LEVEL}{var.AREA}\LMA\processed"
-    for year in YEARS:
-        filename = fr"{path}\ontvangst_{var.AREA.lower()}_{year}_full.csv"
-        df = pd.read_csv(filename, low_memory=False)
-        prod_only = filter_by_area(df)
-        prod_only['Gewicht_kt'] = prod_only['Gewicht_KG'] / 10 ** 6
-        concats.append(prod_only)
+    for year in range(BEGIN, config.year + 1):
+        prod_only = utils.get_production(
+            config,
+            area=config.area,
+            level=config.level,
+            year=year,
+            role=var.ROLES['Ontvangst']['source']
+        )
+        concats.append(prod_only.assign(
+            Gewicht_kt=prod_only['Gewicht_KG'] / 10 ** 6
+        ))
     afval = pd.concat(concats)
-    afval['EuralCode'] = afval['EuralCode'].astype(str).str.zfill(6)
 
     # import process value
-    path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_hoogwaardig.xlsx"
+    path = f"{config.data_dir}/ontology/npce_hoogwaardig.xlsx"
     process = pd.read_excel(path)
     afval = pd.merge(afval, process,
                      left_on='VerwerkingsmethodeCode',
                      right_on='LMA verwerkingscode')
 
     # import process value
-    path = fr"{var.INPUT_DIR}\Database_LockedFiles\DATA\ontology\npce_productgroepen.xlsx"
+    path = f"{config.data_dir}/ontology/npce_productgroepen.xlsx"
     productgroups = pd.read_excel(path, sheet_name='afval')
     productgroups['ewc'] = productgroups['ewc'].astype(str).str.zfill(6)
     afval = pd.merge(afval, productgroups,
@@ -334,17 +309,23 @@ def compute_afval():
         ('behouden_hoeveelheid', behouden_hoeveelheid),
         ('behouden_verwerking', behouden_verwerking)
     ]:
-        indicator, graph = func(afval)
-        DATA['indicators'][goal] = indicator
-        DATA[goal] = graph
+        indicator, graph = func(afval, config.year)
+        data['indicators'][goal] = indicator
+        data[goal] = graph
+
+
+def main(config=None):
+    config = config or Config.from_variables()
+
+    DATA = {
+        'indicators': {}
+    }
+    compute_goederen(config, DATA)
+    compute_afval(config, DATA)
+
+    serializer.dump(DATA, f"{config.output_dir}/npce.json",
+                    decimals=config.json_decimals)
 
 
 if __name__ == '__main__':
-    compute_goederen()
-    compute_afval()
-
-    with open(f"{var.OUTPUT_DIR}/npce.json", 'w') as outfile:
-        from src import _make_iterencode
-        json.encoder._make_iterencode = _make_iterencode._make_iterencode
-        indent = (2, None)
-        json.dump(DATA, outfile, indent=indent)
+    main()
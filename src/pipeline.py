@@ -0,0 +1,273 @@
+import concurrent.futures as cf
+import glob
+import hashlib
+import importlib
+import json
+import os
+from dataclasses import asdict
+from src.analysis import utils
+
+
+# state of the last successful run per stage
+STATE_FILE = 'pipeline.json'
+
+
+def stages(config):
+    """
+    Scripts with the files they read and write
+    inputs: glob patterns of source files or ('table', name) for
+            tables written by another stage with utils.write_sheets
+    outputs: files in the output folder or ('table', name)
+    """
+    data = config.data_dir
+    monitor = config.monitor_dir
+    area = config.area_dir
+    ontology = f'{data}/ontology/*'
+    lma = f'{area}/LMA/processed/*'
+    # area polygons used to locate flows (shapefile with sidecar files)
+    level = utils.LEVELS[config.level]
+    polygons = f'{config.input_dir}/Database_LockedFiles/GEODATA/areas/{level}/{level}_{config.year}.*'
+
+    return {
+        'dmi_dmc': {
+            'inputs': [
+                f'{monitor}/CBS/{config.corop_file}.csv',
+                f'{monitor}/geofluxus/cbs_biotisch_abiotisch_2024_final.csv',
+                f'{monitor}/geoFluxus/CBS_to_RME.xlsx',
+            ],
+            'outputs': [
+                ('table', 'all_data'),
+                ('table', 'euro_data_all'),
+                ('table', 'all_raw_material_data'),
+                ('table', 'dmi_dmc'),
+            ]
+        },
+        'impact': {
+            'inputs': [
+                ('table', 'all_data'),
+                f'{monitor}/geoFluxus/MKI_CO2_factors.xlsx',
+                ontology,
+            ],
+            'outputs': [
+                'impact.json',
+                ('table', 'all_impact_data'),
+            ]
+        },
+        'raw_materials': {
+            'inputs': [
+                ('table', 'dmi_dmc'),
+                ('table', 'all_data'),
+                ontology,
+            ],
+            'outputs': ['raw_materials.json']
+        },
+        'materials': {
+            'inputs': [
+                ('table', 'all_data'),
+                lma,
+                ontology,
+                f'{monitor}/CBS/*',
+                f'{area}/CBS/*',
+                f'{config.input_dir}/GEODATA/postcodes/{config.postcodes}.csv',
+                polygons,
+            ],
+            'outputs': ['materials.json']
+        },
+        'supply_security': {
+            'inputs': [
+                ('table', 'all_data'),
+                ('table', 'euro_data_all'),
+                f'{monitor}/TNO/*',
+                f'{monitor}/geoFluxus/*',
+            ],
+            'outputs': [
+                'supply_security.json',
+                ('table', 'material_contents'),
+            ]
+        },
+        'npce': {
+            'inputs': [
+                ('table', 'all_data'),
+                lma,
+                ontology,
+                polygons,
+            ],
+            'outputs': ['npce.json']
+        },
+        'waste': {
+            'inputs': [
+                lma,
+                f'{data}/LMA/ontvangst/processed/*',
+                f'{data}/descriptions/*',
+                f'{data}/geofluxusApp/templates/*',
+                ontology,
+                polygons,
+            ],
+            'outputs': [
+                'waste.json',
+                ('table', 'benchmark'),
+            ]
+        },
+        'general_overview': {
+            'inputs': [
+                ('table', 'all_impact_data'),
+                ('table', 'all_raw_material_data'),
+                ('table', 'material_contents'),
+                ('table', 'benchmark'),
+            ],
+            'outputs': ['general_overview.xlsx']
+        },
+    }
+
+
+def output_path(config, output):
+    """
+    location of a stage output
+    """
+    if isinstance(output, tuple):
+        return f'{config.output_dir}/tables/{output[1]}'
+    return f'{config.output_dir}/{output}'
+
+
+def input_files(config, item):
+    """
+    files behind a stage input
+    """
+    if isinstance(item, tuple):
+        return sorted(glob.glob(f'{output_path(config, item)}/*.parquet'))
+    return sorted(glob.glob(item))
+
+
+def code_stamp():
+    """
+    stamp of the analysis code & variables
+    (any change reruns all stages)
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    files = sorted(glob.glob(f'{root}/src/**/*.py', recursive=True))
+    files.append(f'{root}/variables.py')
+    return [utils.file_stamp(path) for path in files]
+
+
+def stage_key(config, stage, code):
+    """
+    key of the current inputs & settings of a stage
+    """
+    stamps = {
+        path: utils.file_stamp(path)
+        for item in stage['inputs']
+        for path in input_files(config, item)
+    }
+    content = json.dumps([stamps, code, asdict(config)], sort_keys=True)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def dependencies(tasks):
+    """
+    stages producing the inputs of each stage
+    """
+    producers = {
+        output: name
+        for name, stage in tasks.items()
+        for output in stage['outputs']
+    }
+    return {
+        name: {
+            producers[item] for item in stage['inputs']
+            if item in producers
+        }
+        for name, stage in tasks.items()
+    }
+
+
+def load_state(config):
+    path = f'{config.cache_dir}/{STATE_FILE}'
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(config, state):
+    path = f'{config.cache_dir}/{STATE_FILE}'
+    os.makedirs(config.cache_dir, exist_ok=True)
+    with open(f'{path}.{os.getpid()}', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(f'{path}.{os.getpid()}', path)
+
+
+def run_stage(name, config):
+    """
+    run the main() of a stage script
+    """
+    importlib.import_module(f'src.{name}').main(config)
+    return name
+
+
+def run(config, selected=None, force=False, workers=None):
+    """
+    Run stages in dependency order,
+    independent stages in parallel processes.
+    A stage is skipped if its inputs are unchanged
+    since its last run and its outputs exist
+    selected: stages to run (with the stages they depend on)
+    force: run selected stages even if unchanged
+    """
+    tasks = stages(config)
+    depends = dependencies(tasks)
+
+    # add upstream stages of selection
+    selected = list(selected or tasks)
+    for name in selected:
+        if name not in tasks:
+            raise KeyError(f"Unknown stage '{name}', choose from: {', '.join(tasks)}")
+        selected.extend(d for d in depends[name] if d not in selected)
+    pending = [name for name in tasks if name in selected]
+
+    os.makedirs(config.output_dir, exist_ok=True)
+    state = load_state(config)
+    code = code_stamp()
+    keys, running, done, failed = {}, {}, set(), set()
+
+    with cf.ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # schedule stages with completed dependencies
+            for name in list(pending):
+                if depends[name] & failed:
+                    print(f'Skip {name}: upstream stage failed')
+                    pending.remove(name)
+                    failed.add(name)
+                    continue
+                if not depends[name] <= done | (set(tasks) - set(selected)):
+                    continue
+                pending.remove(name)
+                keys[name] = stage_key(config, tasks[name], code)
+                outputs = [output_path(config, o) for o in tasks[name]['outputs']]
+                if not force and state.get(name) == keys[name] and \
+                        all(os.path.exists(path) for path in outputs):
+                    print(f'Skip {name}: up to date')
+                    done.add(name)
+                    continue
+                print(f'Run {name}...')
+                running[executor.submit(run_stage, name, config)] = name
+
+            if not running:
+                continue
+
+            finished, _ = cf.wait(running, return_when=cf.FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception as error:
+                    print(f'Stage {name} failed: {error!r}')
+                    failed.add(name)
+                    state.pop(name, None)
+                else:
+                    print(f'Finished {name}')
+                    done.add(name)
+                    state[name] = keys[name]
+                save_state(config, state)
+
+    if failed:
+        raise RuntimeError(f"Failed stages: {', '.join(sorted(failed))}")
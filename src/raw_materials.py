@@ -1,21 +1,23 @@
-import variables as var
-import json
 from src.analysis import (
     raw_material_highlights,
     overview_materials,
     renewable_materials
 )
+from src import serializer
+from src.config import Config
 
 
-DATA = {}
+def main(config=None):
+    config = config or Config.from_variables()
 
-if __name__ == '__main__':
-    DATA["highlights"] = raw_material_highlights.run()
-    DATA["overview_materials"] = overview_materials.run()
-    DATA['renewable'] = renewable_materials.run()
+    DATA = {}
+    DATA["highlights"] = raw_material_highlights.run(config)
+    DATA["overview_materials"] = overview_materials.run(config)
+    DATA['renewable'] = renewable_materials.run(config)
+
+    serializer.dump(DATA, f"{config.output_dir}/raw_materials.json",
+                    decimals=config.json_decimals)
 
-    with open(f"{var.OUTPUT_DIR}/raw_materials.json", 'w') as outfile:
-        from src import _make_iterencode
-        json.encoder._make_iterencode = _make_iterencode._make_iterencode
-        indent = (2, None)
-        json.dump(DATA, outfile, indent=indent)
\ No newline at end of file
+
+if __name__ == '__main__':
+    main()
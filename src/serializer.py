@@ -0,0 +1,89 @@
+''' JSON export of the analysis data with indented objects & compact arrays
+(the layout of json.dump with indent=(2, None) of the former _make_iterencode override),
+without replacing the encoder of the json module: arrays of plain values,
+the bulk of the data, are written by the C encoder of the json module
+'''
+import json
+
+
+INDENT = '  '
+
+# encoder of values & arrays of values (C accelerated without indent)
+encoder = json.JSONEncoder(separators=(',', ': '))
+
+
+# types of plain values
+SCALARS = {str, int, float, bool, type(None)}
+
+
+def round_floats(values, decimals):
+    return [
+        round(value, decimals) if isinstance(value, float) else value
+        for value in values
+    ]
+
+
+def encode_key(key):
+    """
+    object keys as strings (like the json module)
+    """
+    if isinstance(key, str):
+        return key
+    if isinstance(key, float):
+        return encoder.encode(key)
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    if isinstance(key, int):
+        return int.__repr__(key)
+    raise TypeError(f'keys must be str, int, float, bool or None, not {type(key).__name__}')
+
+
+def iterencode(value, decimals=None, level=0):
+    """
+    iterate over the chunks of the JSON of value
+    decimals: round floats to decimals (if not None)
+    """
+    if isinstance(value, dict):
+        if not value:
+            yield '{}'
+            return
+        newline = '\n' + INDENT * (level + 1)
+        separator = '{' + newline
+        for key, item in value.items():
+            yield separator + encoder.encode(encode_key(key)) + ': '
+            yield from iterencode(item, decimals=decimals, level=level + 1)
+            separator = ',' + newline
+        yield '\n' + INDENT * level + '}'
+    elif isinstance(value, (list, tuple)):
+        if SCALARS.issuperset(map(type, value)):
+            if decimals is not None:
+                value = round_floats(value, decimals)
+            yield encoder.encode(list(value))
+            return
+        separator = '['
+        for item in value:
+            yield separator
+            yield from iterencode(item, decimals=decimals, level=level)
+            separator = ','
+        yield ']'
+    else:
+        if decimals is not None and isinstance(value, float):
+            value = round(value, decimals)
+        yield encoder.encode(value)
+
+
+def dumps(data, decimals=None):
+    return ''.join(iterencode(data, decimals=decimals))
+
+
+def dump(data, path, decimals=None):
+    """
+    write data as JSON file
+    decimals: round floats to decimals (if not None)
+    """
+    with open(path, 'w') as outfile:
+        outfile.writelines(iterencode(data, decimals=decimals))
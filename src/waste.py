@@ -1,29 +1,92 @@
-import variables as var
-import json
-from src.analysis import (waste_highlights,
+import argparse
+import os
+from src import config as cfg, serializer
+from src.analysis import (utils,
+                          waste_highlights,
                           waste_trends,
                           benchmark,
                           eural_treemap)
+from src.config import Config
 
 
-DATA = {}
+def export(config, data, output_dir=None):
+    serializer.dump(data, f"{output_dir or config.output_dir}/waste.json",
+                    decimals=config.json_decimals)
 
-if __name__ == '__main__':
-    # waste trends (production & processing)
-    DATA = dict(**waste_trends.run())
 
-    # highlights
-    DATA['highlights'] = waste_highlights.run()
+def main(config=None):
+    config = config or Config.from_variables()
+
+    # area production is loaded once for all analyses
+    with utils.shared_datasets():
+        # waste trends (production & processing)
+        DATA = dict(**waste_trends.run(config))
+
+        # highlights
+        DATA['highlights'] = waste_highlights.run(config)
+
+        # eural treemap
+        DATA['eural_treemap'] = eural_treemap.run(config)
+
+        # benchmark sankey
+        DATA['benchmark_sankey'] = benchmark.run(config)
+
+    export(config, DATA)
 
-    # eural treemap
-    DATA['eural_treemap'] = eural_treemap.run()
 
-    # benchmark sankey
-    DATA['benchmark_sankey'] = benchmark.run()
+def main_areas(config=None, areas=None):
+    """
+    Waste page for all areas of the config level in one pass
+    over the national dataset, exported to {output_dir}/{level}{area}
+    areas: names of areas to export (default: all)
+    """
+    config = config or Config.from_variables()
 
-    with open(f"{var.OUTPUT_DIR}/waste.json", 'w') as outfile:
-        from src import _make_iterencode
-        json.encoder._make_iterencode = _make_iterencode._make_iterencode
-        indent = (2, None)
-        json.dump(DATA, outfile, indent=indent)
+    # national production is loaded & located once for all analyses
+    with utils.shared_datasets():
+        trends = waste_trends.run_areas(config, areas)
+        highlights = waste_highlights.run_areas(config, areas)
+        treemaps = eural_treemap.run_areas(config, areas)
+        benchmarks = benchmark.run_areas(config, areas)
+
+    # report areas without results of any analysis
+    names = utils.import_areas(config, level=config.level)['name'].tolist()
+    results = {
+        'trends': trends,
+        'highlights': highlights,
+        'eural_treemap': treemaps,
+        'benchmark_sankey': benchmarks,
+    }
+    for area in areas or names:
+        if area not in names:
+            print(f"Skip {area}: no {config.level} with this name")
+            continue
+        missing = [name for name, result in results.items() if area not in result]
+        if 'trends' in missing:
+            print(f"Skip {area}: no production flows")
+            continue
+        if missing:
+            print(f"Warning: no {', '.join(missing)} for {area}")
+
+        output_dir = utils.area_dir(config, area=area, level=config.level)
+        os.makedirs(output_dir, exist_ok=True)
+        export(config, {
+            **trends[area],
+            'highlights': highlights.get(area),
+            'eural_treemap': treemaps.get(area),
+            'benchmark_sankey': benchmarks.get(area),
+        }, output_dir=output_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export waste page data')
+    parser.add_argument('--batch', nargs='*', metavar='AREA',
+                        help='export all areas of the level (or the given ones)')
+    cfg.add_arguments(parser)
+    args = parser.parse_args()
+    config = cfg.from_arguments(args)
 
+    if args.batch is None:
+        main(config)
+    else:
+        main_areas(config, args.batch or None)
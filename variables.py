@@ -9,14 +9,21 @@ DMI_YEARS = [_ for _ in range(2015, 2024)]
 GOALS_YEARS = [_ for _ in range(2018, 2024)]
 ACTIONS_YEARS = [_ for _ in range(2018, 2024)]
 QUARTER = 4
-COROP_FILE = f"Tabel Regionale stromen 2015-2023 " \
-             f"{'provincie' if LEVEL == 'Provincie' else 'Coropplus'}"
+COROP_FILES = {
+    'Provincie': "Tabel Regionale stromen 2015-2023 provincie",
+    'Gemeente': "Tabel Regionale stromen 2015-2023 Coropplus"
+}
+COROP_FILE = COROP_FILES[LEVEL]
 COROPS = ['Zuidwest-Overijssel']
 HOUSEHOLD_KG = 37.22 * 10**6
 EXCLUDE_HOUSEHOLD = True
 
 POSTCODES = f'postcodes_per_gemeenten_{YEAR}'
 OUTPUT_DIR = '../json'
+CACHE_DIR = '../cache'
+STAGE_CACHE_GB = 2
+EXPORT_EXCEL = False
+JSON_DECIMALS = None  # round floats in the exported json (None: keep all digits)
 
 # UNITS
 unit = 'Mt' if LEVEL == 'Provincie' else 'kt'